@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import jwt
-from passlib.context import CryptContext
 
 from config import settings
 from database import get_db
 import models, schemas
-from crud import create_user
+from crud import add_user
+from hashing import hashing_service
 from email_mailer.service import email_service
+from email_mailer.tokens import TokenManager
+from principal_cache import principal_cache
+from rate_limit import rate_limiter
+from replicas import get_read_db, replica_router
 
 
 SECRET_KEY = settings.SECRET_KEY
@@ -25,28 +30,44 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> schemas.User:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id = int(payload.get("sub"))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {str(e)}")
-    
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+
+    # The signature and expiry are checked above on every request; only the users lookup is cached
+    cached = await principal_cache.get(user_id, token)
+    if cached:
+        return cached
+
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+    principal = schemas.User.model_validate(user)
+    await principal_cache.set(user_id, token, principal)
+    return principal
+
 router = APIRouter()
 
-@router.post("/login", response_model=schemas.LoginResponse)
-def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == credentials.email).first()
+@router.post("/login", response_model=schemas.LoginResponse, dependencies=[Depends(rate_limiter.limit("login"))])
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
 
-    if not user or not pwd_context.verify(credentials.password, user.password):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    verified, new_hash = await hashing_service.verify_and_update_async(credentials.password, user.password)
+    if not verified:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # Stored hash used stale parameters or bcrypt: upgrade it while we have the password
+        user.password = new_hash
+        await db.commit()
+
     access_token = create_access_token(data={"sub": str(user.id)})
 
     return {
@@ -57,11 +78,17 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/register", response_model=schemas.LoginResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = create_user(db, user)
+@router.post("/register", response_model=schemas.LoginResponse, dependencies=[Depends(rate_limiter.limit("register"))])
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    hashed_password = await hashing_service.hash_async(user.password)
 
-    email_service.send_verification_email(db, db_user)
+    # User, verification token and outbox row commit together; delivery happens in the background
+    db_user = await db.run_sync(add_user, user, hashed_password)
+    await db.run_sync(email_service.queue_verification_email, db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    # The first authenticated request comes straight back; it must not miss the user on a lagging replica
+    await replica_router.note_write(db_user.id)
 
     access_token = create_access_token(data={"sub": str(db_user.id)})
 
@@ -73,26 +100,22 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.get("/verify-email")
-def verify_email(token: str, db: Session = Depends(get_db)):
-    verification = db.query(models.EmailVerification).filter(
-        models.EmailVerification.token == token,
-        models.EmailVerification.is_used == False
-    ).first()
-
-    if not verification or verification.expires_at < datetime.utcnow():
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
+    user_id = await db.run_sync(TokenManager.consume_verification_token, token)
+    if user_id is None:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(models.User).filter(models.User.id == verification.user_id).first()
-    user.is_verified = True
-    verification.is_used = True
+    await db.execute(update(models.User).where(models.User.id == user_id).values(is_verified=True))
 
-    db.commit()
+    await db.commit()
+    await principal_cache.invalidate(user_id)
+    await replica_router.note_write(user_id)
 
     return {"message": "Email verified successfully"}
 
-@router.post("/resend-verification")
-def resend_verification(email: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == email).first()
+@router.post("/resend-verification", dependencies=[Depends(rate_limiter.limit("resend_verification"))])
+async def resend_verification(email: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == email))
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -100,35 +123,35 @@ def resend_verification(email: str, db: Session = Depends(get_db)):
     if user.is_verified:
         raise HTTPException(status_code=400, detail="Email already verified")
 
-    email_service.send_verification_email(db, user)
+    await db.run_sync(email_service.queue_verification_email, user)
+    await db.commit()
 
     return {"message": "Verification email sent"}
 
-@router.post("/forgot-password")
-def forgot_password(request: schemas.PasswordResetRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+@router.post("/forgot-password", dependencies=[Depends(rate_limiter.limit("forgot_password"))])
+async def forgot_password(request: schemas.PasswordResetRequest, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == request.email))
 
     if not user:
         return {"message": "If the email exists, a reset link was sent"}  # security best practice
 
-    email_service.send_password_reset_email(db, user)
+    await db.run_sync(email_service.queue_password_reset_email, user)
+    await db.commit()
 
     return {"message": "Password reset email sent"}
 
-@router.post("/reset-password")
-def reset_password(request: schemas.PasswordResetConfirm, db: Session = Depends(get_db)):
-    reset = db.query(models.PasswordReset).filter(
-        models.PasswordReset.token == request.token,
-        models.PasswordReset.is_used == False
-    ).first()
-
-    if not reset or reset.expires_at < datetime.utcnow():
+@router.post("/reset-password", dependencies=[Depends(rate_limiter.limit("reset_password"))])
+async def reset_password(request: schemas.PasswordResetConfirm, db: AsyncSession = Depends(get_db)):
+    user_id = await db.run_sync(TokenManager.consume_password_reset_token, request.token)
+    if user_id is None:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(models.User).filter(models.User.id == reset.user_id).first()
-    user.password = pwd_context.hash(request.new_password)
-    reset.is_used = True
+    await db.execute(update(models.User).where(models.User.id == user_id).values(
+        password=await hashing_service.hash_async(request.new_password)
+    ))
 
-    db.commit()
+    await db.commit()
+    await principal_cache.invalidate(user_id)
+    await replica_router.note_write(user_id)
 
     return {"message": "Password updated successfully"}
\ No newline at end of file
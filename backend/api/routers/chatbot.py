@@ -1,90 +1,270 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
-from google.genai import Client
+from starlette.concurrency import run_in_threadpool
+import re
 from schemas import ChatMessage, ChatResponse
+import schemas
 from config import settings
+from database import AsyncSessionLocal, SessionLocal
+from llm_providers import LLMProvider, ProviderNotConfigured, build_provider
+from chat_cache import prompt_fingerprint, response_cache
+from chat_memory import Conversation, Turn
+from rate_limit import rate_limiter
+from study_snapshot import snapshot_cache
+from api.routers.auth import get_current_user
 import json
 import asyncio
 
 router = APIRouter()
 
-# Configure Gemini API with the new SDK
-client = Client(api_key=settings.GEMINI_API_KEY)
+# Gemini, or the local fake when CHAT_PROVIDER=fake; built on the first reply so importing
+# the app never loads the Gemini SDK. Benchmarks assign their own.
+provider = None
 
-# Add context
+
+def get_provider() -> LLMProvider:
+    global provider
+    if provider is None:
+        provider = build_provider()
+    return provider
+
+# Bounds upstream calls per process; waiting callers give up after CHAT_QUEUE_TIMEOUT_SECONDS
+generation_slots = asyncio.Semaphore(settings.CHAT_MAX_CONCURRENT_GENERATIONS)
+
+# Sent once per request as the system instruction
 context = """You are a helpful AI study assistant for StudyFlow, an application that helps students 
     manage their study sessions and improve their focus. You should provide helpful, encouraging, 
     and educational responses related to studying, time management, focus techniques, and academic success. 
     Keep your responses concise and friendly.
 """
 
+# Questions about the student's own studying get their study snapshot in the system instruction.
+# Kept narrow: a grounded message skips the shared reply cache.
+PERSONAL_QUESTION = re.compile(
+    r"\bmy\s+(?:\w+\s+)?(?:streaks?|progress|sessions?|stats|statistics|study\s+time|habits?|hours|minutes"
+    r"|history|goals?|quality|focus|subjects?|week|month|average|record)\b"
+    r"|\b(?:did|have)\s+i\s+(?:\w+\s+)?(?:stud(?:y|ied|ying)|focus(?:ed|ing)?|revis(?:e|ed|ing)|work(?:ed)?|done|do)\b"
+    r"|\bam\s+i\s+(?:on\s+track|improving|doing|making\s+progress|consistent)\b",
+    re.IGNORECASE
+)
+
+# Cached replies are only reused for the same prompt, provider and model
+PROMPT_FINGERPRINT = prompt_fingerprint(settings.CHAT_PROVIDER, settings.CHAT_MODEL, context)
+
+
+class GenerationBusy(Exception):
+    """Raised when no generation slot frees up within CHAT_QUEUE_TIMEOUT_SECONDS"""
+
+
+@asynccontextmanager
+async def generation_slot():
+    try:
+        await asyncio.wait_for(generation_slots.acquire(), settings.CHAT_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise GenerationBusy()
+    try:
+        yield
+    finally:
+        generation_slots.release()
+
+
+async def stream_reply(turns: list, system_instruction: str, usage: dict = None):
+    """Yield reply text chunks from the provider without blocking the event loop"""
+    async with generation_slot():
+        async for text in get_provider().stream(turns, system_instruction=system_instruction, usage=usage):
+            yield text
+
+
+async def reply_chunks(
+    user_message: str,
+    conversation: Conversation = None,
+    personalized: bool = False,
+    usage: dict = None,
+    snapshot: Optional[str] = None
+):
+    """Yield the reply's chunks, replaying a cached reply when there is one.
+
+    A study snapshot, when given, is appended to the system instruction and
+    makes the reply personal, so it never goes through the shared cache.
+    """
+    usage = {} if usage is None else usage
+    personalized = personalized or snapshot is not None
+    # Follow-up questions depend on the conversation so far and are never served from the cache
+    follow_up = bool(conversation and conversation.turns)
+    cache_key = response_cache.key(user_message, PROMPT_FINGERPRINT, personalized or follow_up)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        usage.update(prompt_tokens=0, cached=True)
+        for text in cached:
+            yield text
+        if conversation:
+            conversation.record(user_message, "".join(cached))
+        return
+
+    if conversation:
+        turns, dropped = conversation.prompt_turns(user_message)
+    else:
+        turns, dropped = [Turn("user", user_message)], 0
+    usage.update(history_turns=len(turns) - 1, dropped_exchanges=dropped, grounded=snapshot is not None)
+    system_instruction = f"{context}\n\n{snapshot}" if snapshot else context
+
+    chunks = []
+    async for text in stream_reply(turns, system_instruction, usage):
+        chunks.append(text)
+        yield text
+    # Only complete replies are remembered or cached; a failed or cancelled stream never gets here
+    if conversation:
+        conversation.record(user_message, "".join(chunks))
+    if cache_key:
+        response_cache.set(cache_key, chunks)
+
+
+async def stream_to_client(
+    websocket: WebSocket,
+    user_message: str,
+    conversation: Conversation,
+    personalized: bool = False,
+    snapshot: Optional[str] = None
+):
+    usage = {}
+    try:
+        full_response = ""
+        async for text in reply_chunks(user_message, conversation, personalized, usage, snapshot):
+            await websocket.send_text(json.dumps({"type": "chunk", "content": text}))
+            full_response += text
+
+        # Send completion message; usage reports this turn's prompt size so trimming savings are visible
+        await websocket.send_text(json.dumps({"type": "complete", "full_response": full_response, "usage": usage}))
+
+    except GenerationBusy:
+        await websocket.send_text(json.dumps({"type": "error", "message": "The assistant is busy, please try again shortly."}))
+    except ProviderNotConfigured:
+        await websocket.send_text(json.dumps({"type": "error", "message": "The assistant is not available."}))
+    except Exception as e:
+        print(f"Error generating content: {e}")
+        await websocket.send_text(json.dumps({"type": "error", "message": "Error generating response."}))
+
+
+async def resolve_user(token: str) -> Optional[schemas.User]:
+    async with AsyncSessionLocal() as db:
+        try:
+            return await get_current_user(token, db)
+        except HTTPException:
+            return None
+
+
+async def authenticate(websocket: WebSocket) -> Optional[schemas.User]:
+    """Expect {"type": "auth", "token": <access token>} as the first frame"""
+    try:
+        frame = json.loads(await asyncio.wait_for(websocket.receive_text(), settings.CHAT_AUTH_TIMEOUT_SECONDS))
+    except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        return None
+    if not isinstance(frame, dict) or frame.get("type") != "auth" or not frame.get("token"):
+        return None
+    return await resolve_user(str(frame["token"]))
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+
+    # The token travels in the first frame rather than the URL so it never lands in access logs
+    user = await authenticate(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Authentication required")
+        return
+    await websocket.send_text(json.dumps({"type": "ready"}))
+
+    conversation = Conversation(settings.CHAT_HISTORY_TOKEN_BUDGET, settings.CHAT_SUMMARY_TOKEN_BUDGET)
+
+    # A separate reader notices a disconnect even while a reply is streaming
+    incoming = asyncio.Queue()
+
+    async def read_messages():
+        try:
+            while True:
+                incoming.put_nowait(await websocket.receive_text())
+        except WebSocketDisconnect:
+            print("Client disconnected")
+        finally:
+            incoming.put_nowait(None)
+
+    reader = asyncio.create_task(read_messages())
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
+            data = await incoming.get()
+            if data is None:
+                break
             message_data = json.loads(data)
             user_message = message_data.get("message", "")
+            personalized = bool(message_data.get("personalized", False))
 
             if not user_message:
                 continue
-            
-            full_prompt = f"{context}\n\nUser message: {user_message}"
-
-            # Stream response from Gemini
-            try:
-                response_stream = client.models.generate_content_stream(
-                    model='models/gemini-flash-latest',
-                    contents=full_prompt
-                )
-
-                full_response = ""
-                for chunk in response_stream:
-                    if chunk.text:
-                        await websocket.send_text(json.dumps({"type": "chunk", "content": chunk.text}))
-                        full_response += chunk.text
-                
-                # Send completion message
-                await websocket.send_text(json.dumps({"type": "complete", "full_response": full_response}))
-
-            except Exception as e:
-                print(f"Error generating content: {e}")
-                await websocket.send_text(json.dumps({"type": "error", "message": "Error generating response."}))
-
-    except WebSocketDisconnect:
-        print("Client disconnected")
+
+            if len(user_message) > settings.CHAT_MAX_MESSAGE_CHARS:
+                await websocket.send_text(json.dumps({"type": "error", "message": "Message is too long."}))
+                continue
+
+            snapshot = None
+            if PERSONAL_QUESTION.search(user_message):
+                # A dict lookup unless the user's sessions changed since the last build
+                cached = snapshot_cache.get(user.id)
+                if cached is None:
+                    cached = await run_in_threadpool(snapshot_cache.get_or_build, SessionLocal, user.id)
+                snapshot = cached.text
+
+            generation = asyncio.create_task(
+                stream_to_client(websocket, user_message, conversation, personalized, snapshot)
+            )
+            await asyncio.wait({generation, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not generation.done():
+                # Client went away mid-stream: stop the upstream call and free its slot
+                generation.cancel()
+                break
+            generation.result()
+
     except Exception as e:
         print(f"WebSocket error: {e}")
         try:
             await websocket.close()
         except:
             pass
+    finally:
+        reader.cancel()
 
-@router.post("/message", response_model=ChatResponse)
+@router.post("/message", response_model=ChatResponse, dependencies=[Depends(rate_limiter.limit("chatbot"))])
 async def send_message(chat_message: ChatMessage):
     """
     Send a message to the Gemini chatbot and get a response (Legacy HTTP endpoint)
     """
-    try:        
-        # Send message with context using the new API
-        full_prompt = f"{context}\n\nUser message: {chat_message.message}"
-        
-        response = client.models.generate_content(
-            model='models/gemini-flash-latest',
-            contents=full_prompt
+    if len(chat_message.message) > settings.CHAT_MAX_MESSAGE_CHARS:
+        raise HTTPException(status_code=413, detail="Message is too long.")
+
+    try:
+        reply = "".join([
+            text async for text in reply_chunks(chat_message.message, personalized=chat_message.personalized)
+        ])
+
+        return ChatResponse(reply=reply)
+
+    except GenerationBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy, please try again shortly.",
+            headers={"Retry-After": "1"}
         )
-        
-        return ChatResponse(reply=response.text)
-    
+    except ProviderNotConfigured:
+        raise HTTPException(status_code=503, detail="The assistant is not available.")
     except Exception as e:
         # Log the error for debugging
         print(f"Gemini API error: {str(e)}")
         print(f"Error type: {type(e).__name__}")
-        
+
         # Return a user-friendly error message
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail="I'm having trouble connecting right now. Please try again in a moment."
-        )
\ No newline at end of file
+        )
@@ -1,26 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import models, schemas
 from api.routers.auth import get_current_user
+from principal_cache import principal_cache
+from replicas import replica_router
 
 router = APIRouter()
 
 @router.get("/me", response_model=schemas.User)
-def get_profile(current_user: models.User = Depends(get_current_user)):
+async def get_profile(current_user: schemas.User = Depends(get_current_user)):
     # current_user comes from JWT, safe
     return current_user
 
 @router.put("/me", response_model=schemas.User)
-def update_profile(
+async def update_profile(
     profile: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
-    # update only the current user
+    # update only the current user (the cached principal is a detached snapshot)
+    db_user = await db.get(models.User, current_user.id)
     for key, value in profile.dict(exclude_unset=True).items():
-        setattr(current_user, key, value)
+        setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    await db.commit()
+    await db.refresh(db_user)
+    await principal_cache.invalidate(db_user.id)
+    await replica_router.note_write(db_user.id)
+    return db_user
@@ -1,66 +1,382 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import Iterator, Literal, Optional
+from datetime import date, datetime, time, timedelta
+import anyio.from_thread
+import base64
+import csv
+import io
+import json
+import zlib
+from database import SessionLocal, get_db, get_sync_db
 import models, schemas
-from crud import create_session
+import crud
+from responses import FastJSONResponse
+from replicas import get_read_db, replica_router
+from study_snapshot import snapshot_cache
 from api.routers.auth import get_current_user
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.StudySession])
-def get_sessions(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def sessions_changed(user_id: int):
+    """Await after committing a change to the user's sessions"""
+    snapshot_cache.invalidate(user_id)
+    await replica_router.note_write(user_id)
+
+def encode_cursor(start_time: datetime, session_id: int) -> str:
+    raw = json.dumps([start_time.isoformat(), session_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_time, session_id = json.loads(raw)
+        return datetime.fromisoformat(start_time), int(session_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def filter_sessions(
+    query,
+    subject: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_quality: Optional[int] = None,
+    max_quality: Optional[int] = None
+):
+    # Takes a Query (export) or a select() (list)
+    # Date bounds are half-open ranges on start_time so (user_id, start_time) stays usable
+    if subject:
+        query = query.filter(models.StudySession.subject == subject)
+    if start_date:
+        query = query.filter(models.StudySession.start_time >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.filter(models.StudySession.start_time < datetime.combine(end_date + timedelta(days=1), time.min))
+    if min_quality is not None:
+        query = query.filter(models.StudySession.quality >= min_quality)
+    if max_quality is not None:
+        query = query.filter(models.StudySession.quality <= max_quality)
+    return query
+
+# Exactly the fields of schemas.StudySession, selected as plain tuples
+LIST_COLUMNS = (
+    models.StudySession.id,
+    models.StudySession.user_id,
+    models.StudySession.subject,
+    models.StudySession.start_time,
+    models.StudySession.end_time,
+    models.StudySession.duration_minutes,
+    models.StudySession.quality,
+    models.StudySession.percentage_completion,
+    models.StudySession.notes,
+)
+LIST_FIELDS = [column.key for column in LIST_COLUMNS]
+
+@router.get("/", response_model=schemas.SessionPage)
+async def get_sessions(
+    subject: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_quality: Optional[int] = None,
+    max_quality: Optional[int] = None,
+    order_dir: Literal["asc", "desc"] = "desc",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
     # Only return sessions belonging to the current user
-    return db.query(models.StudySession).filter(
-        models.StudySession.user_id == current_user.id
-    ).all()
+    query = filter_sessions(
+        select(*LIST_COLUMNS).where(models.StudySession.user_id == current_user.id),
+        subject, start_date, end_date, min_quality, max_quality
+    )
+
+    # Keyset pagination on (start_time, id): each page is an index range scan, however deep
+    key = tuple_(models.StudySession.start_time, models.StudySession.id)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < after if order_dir == "desc" else key > after)
+
+    if order_dir == "desc":
+        query = query.order_by(models.StudySession.start_time.desc(), models.StudySession.id.desc())
+    else:
+        query = query.order_by(models.StudySession.start_time.asc(), models.StudySession.id.asc())
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    items = [dict(zip(LIST_FIELDS, row)) for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]["start_time"], items[-1]["id"]) if len(rows) > limit else None
+
+    # Plain dicts straight to orjson: no ORM hydration, no per-row pydantic validation
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+EXPORT_COLUMNS = (
+    models.StudySession.id,
+    models.StudySession.subject,
+    models.StudySession.start_time,
+    models.StudySession.end_time,
+    models.StudySession.duration_minutes,
+    models.StudySession.quality,
+    models.StudySession.percentage_completion,
+    models.StudySession.notes,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+EXPORT_BATCH_SIZE = 1000
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def iter_export(user_id: int, fmt: str, compress: bool, filters: dict) -> Iterator[bytes]:
+    """Yield the user's sessions as CSV or NDJSON, one encoded batch at a time"""
+    # The export owns its DB session: it outlives the request's get_db dependency
+    db = SessionLocal()
+    encoder = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return encoder.compress(data) if encoder else data
+
+    try:
+        query = filter_sessions(
+            db.query(*EXPORT_COLUMNS).filter(models.StudySession.user_id == user_id),
+            **filters
+        ).order_by(models.StudySession.id).yield_per(EXPORT_BATCH_SIZE)
+
+        if fmt == "csv":
+            writer.writerow(EXPORT_FIELDS)
+
+        for count, row in enumerate(query, start=1):
+            values = [_export_value(value) for value in row]
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))))
+                buffer.write("\n")
+            if count % EXPORT_BATCH_SIZE == 0:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+
+        chunk = flush()
+        if encoder:
+            chunk += encoder.flush()
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_sessions(
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    subject: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_quality: Optional[int] = None,
+    max_quality: Optional[int] = None,
+    current_user: schemas.User = Depends(get_current_user)
+):
+    filters = {
+        "subject": subject,
+        "start_date": start_date,
+        "end_date": end_date,
+        "min_quality": min_quality,
+        "max_quality": max_quality,
+    }
+    filename = f"sessions.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+
+    return StreamingResponse(
+        iter_export(current_user.id, format, gzip, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+def _iter_import_records(upload: UploadFile, fmt: str) -> Iterator[tuple]:
+    """Yield (line number, record dict or error message) for each row of the upload"""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Empty CSV cells mean "not set", not an empty string
+            yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items() if key}
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"Invalid JSON: {e}"
+                continue
+            yield line_no, record if isinstance(record, dict) else "Expected a JSON object"
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+@router.post("/import", response_model=schemas.SessionImportResult)
+def import_sessions(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    # Stays sync: it reads the spooled upload in a worker thread and uses psycopg2's COPY
+    db: Session = Depends(get_sync_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    fmt = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    result = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(line_no: int, message: str):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_IMPORT_ERRORS:
+            result["errors"].append({"row": line_no, "error": message})
+
+    def flush(chunk: list):
+        # One savepoint and commit per chunk: a bad chunk never rolls back earlier ones
+        try:
+            with db.begin_nested():
+                crud.bulk_insert_sessions(db, current_user.id, [session for _, session in chunk])
+            db.commit()
+            result["imported"] += len(chunk)
+        except SQLAlchemyError as e:
+            db.rollback()
+            message = f"Database error: {e.__class__.__name__}"
+            for line_no, _ in chunk:
+                fail(line_no, message)
+
+    chunk = []
+    for line_no, record in _iter_import_records(file, fmt):
+        if isinstance(record, str):
+            fail(line_no, record)
+            continue
+        try:
+            chunk.append((line_no, schemas.SessionInput.model_validate(record)))
+        except ValidationError as e:
+            fail(line_no, _validation_message(e))
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    if result["imported"]:
+        # Sync route: hop back to the event loop for the (possibly Redis-backed) write mark
+        anyio.from_thread.run(sessions_changed, current_user.id)
+
+    return result
 
 @router.post("/", response_model=schemas.StudySession)
-def create_new_session(
+async def create_new_session(
     session: schemas.SessionCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
     # Assign the session to the current user
     session.user_id = current_user.id
-    return create_session(db, session)
+    db_session = await db.run_sync(crud.create_session, session)
+    await sessions_changed(current_user.id)
+    return db_session
+
+@router.post("/batch", response_model=schemas.SessionBatchResponse)
+async def batch_sessions(
+    batch: schemas.SessionBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Apply many create/update/delete operations in one transaction.
+
+    Operations that fail validation or reference a session the user does
+    not own are reported individually; the rest are committed together.
+    """
+    # Ownership of every referenced session in one IN query, locked in id order so concurrent batches cannot deadlock
+    ids = {op.id for op in batch.operations if op.op != "create" and op.id is not None}
+    owned = {}
+    if ids:
+        owned = {
+            s.id: s for s in await db.scalars(select(models.StudySession).where(
+                models.StudySession.user_id == current_user.id,
+                models.StudySession.id.in_(ids)
+            ).order_by(models.StudySession.id).with_for_update())
+        }
+
+    results = []
+    staged = []
+    for op in batch.operations:
+        if op.op != "delete" and op.data is None:
+            results.append({"op": op.op, "id": op.id, "status": 400, "error": "data is required"})
+            continue
+        if op.op == "create":
+            db_session = await db.run_sync(crud.add_session, current_user.id, op.data)
+        else:
+            db_session = owned.get(op.id)
+            if db_session is None:
+                results.append({"op": op.op, "id": op.id, "status": 404, "error": "Session not found"})
+                continue
+            if op.op == "update":
+                await db.run_sync(crud.apply_session_update, db_session, op.data)
+            else:
+                await db.run_sync(crud.remove_session, db_session)
+                del owned[op.id]
+        result = {"op": op.op, "id": op.id, "status": 200}
+        results.append(result)
+        if op.op != "delete":
+            staged.append((result, db_session))
+
+    # Flush assigns ids to new sessions; serialize before commit expires the objects
+    await db.flush()
+    for result, db_session in staged:
+        result["id"] = db_session.id
+        result["session"] = schemas.StudySession.model_validate(db_session)
+    await db.commit()
+    await sessions_changed(current_user.id)
+
+    return {"results": results}
 
 @router.put("/{session_id}", response_model=schemas.StudySession)
-def update_session(
+async def update_session(
     session_id: int,
     session: schemas.SessionCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
-    db_session = db.query(models.StudySession).filter(
+    # Locked until commit, so a concurrent update or delete cannot move the same minutes out of the rollup twice
+    db_session = await db.scalar(select(models.StudySession).where(
         models.StudySession.id == session_id,
         models.StudySession.user_id == current_user.id  # ownership enforced
-    ).first()
+    ).with_for_update())
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    for key, value in session.dict().items():
-        setattr(db_session, key, value)
-    db.commit()
-    db.refresh(db_session)
+    db_session = await db.run_sync(crud.update_session, db_session, session)
+    await sessions_changed(current_user.id)
     return db_session
 
 @router.delete("/{session_id}")
-def delete_session(
+async def delete_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
-    db_session = db.query(models.StudySession).filter(
+    # Locked until commit, so a concurrent update or delete cannot move the same minutes out of the rollup twice
+    db_session = await db.scalar(select(models.StudySession).where(
         models.StudySession.id == session_id,
         models.StudySession.user_id == current_user.id  # ownership enforced
-    ).first()
+    ).with_for_update())
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    db.delete(db_session)
-    db.commit()
+    await db.run_sync(crud.delete_session, db_session)
+    await sessions_changed(current_user.id)
     return {"message": "Session deleted"}
@@ -1,51 +1,188 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import get_db
-import models
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, Date, cast
+from replicas import get_read_db
+import models, schemas
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
 from api.routers.auth import get_current_user  # JWT dependency
 
 router = APIRouter()
 
+MAX_BUCKETS = 400
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _period_start(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    return value
+
+
+def _next_period(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value + timedelta(days=7)
+    if granularity == "month":
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def _bucket_count(start: date, end: date, granularity: str) -> int:
+    if granularity == "week":
+        return (end - _period_start(start, "week")).days // 7 + 1
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+
+def _bucket_column(db: AsyncSession, granularity: str):
+    day = models.UserDailyStats.day
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite has no date_trunc; weeks start on Monday like PostgreSQL's
+        if granularity == "week":
+            return func.date(day, "weekday 0", "-6 days")
+        if granularity == "month":
+            return func.date(day, "start of month")
+        return day
+    return cast(func.date_trunc(granularity, day), Date)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+async def build_time_series(db: AsyncSession, user_id: int, start: date, end: date, granularity: str) -> list:
+    """Return one zero-filled bucket per period between start and end (inclusive)"""
+    # Widen start to its period's first day so the first week or month is not a partial total
+    start = _period_start(start, granularity)
+    bucket = _bucket_column(db, granularity).label("bucket")
+    rows = (await db.execute(select(
+        bucket,
+        func.sum(models.UserDailyStats.total_minutes).label("total_minutes"),
+        func.sum(models.UserDailyStats.session_count).label("session_count"),
+        func.sum(models.UserDailyStats.quality_sum).label("quality_sum"),
+        func.sum(models.UserDailyStats.completion_sum).label("completion_sum"),
+    ).where(
+        models.UserDailyStats.user_id == user_id,
+        models.UserDailyStats.day >= start,
+        models.UserDailyStats.day <= end
+    ).group_by(bucket))).all()
+
+    totals = {_as_date(row.bucket): row for row in rows}
+    buckets = []
+    period = start
+    while period <= end:
+        row = totals.get(period)
+        count = int(row.session_count) if row else 0
+        buckets.append({
+            "period_start": period.isoformat(),
+            "total_minutes": int(row.total_minutes) if row else 0,
+            "session_count": count,
+            "avg_quality": round(int(row.quality_sum) / count, 1) if count else 0,
+            "avg_completion": round(int(row.completion_sum) / count, 1) if count else 0,
+        })
+        period = _next_period(period, granularity)
+    return buckets
+
 @router.get("/dashboard")
-def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
     today = datetime.now().date()
 
-    today_sessions = db.query(models.StudySession).filter(
-        models.StudySession.user_id == current_user.id,
-        func.date(models.StudySession.start_time) == today
-    ).all()
+    # Today's totals are a single pre-aggregated rollup row
+    row = await db.get(models.UserDailyStats, (current_user.id, today))
 
-    total_minutes = sum(s.duration_minutes for s in today_sessions)
-    avg_quality = sum(s.quality for s in today_sessions) / len(today_sessions) if today_sessions else 0
-    total_completion = sum(s.percentage_completion for s in today_sessions) / len(today_sessions) if today_sessions else 0
+    if not row or not row.session_count:
+        return {"total_time": 0, "sessions_count": 0, "avg_quality": 0, "total_completion": 0}
 
     return {
-        "total_time": total_minutes,
-        "sessions_count": len(today_sessions),
-        "avg_quality": round(avg_quality, 1),
-        "total_completion": round(total_completion, 1)
+        "total_time": row.total_minutes,
+        "sessions_count": row.session_count,
+        "avg_quality": round(row.quality_sum / row.session_count, 1),
+        "total_completion": round(row.completion_sum / row.session_count, 1)
     }
 
 @router.get("/history")
-def get_history_stats(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_history_stats(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
 ):
-    all_sessions = db.query(models.StudySession).filter(
-        models.StudySession.user_id == current_user.id
-    ).all()
+    # Sums one rollup row per study day rather than one row per session
+    query = select(
+        func.coalesce(func.sum(models.UserDailyStats.total_minutes), 0).label("total_minutes"),
+        func.coalesce(func.sum(models.UserDailyStats.session_count), 0).label("total_sessions"),
+        func.coalesce(func.sum(models.UserDailyStats.quality_sum), 0).label("quality_sum"),
+    ).where(
+        models.UserDailyStats.user_id == current_user.id
+    )
+    if start_date:
+        query = query.where(models.UserDailyStats.day >= start_date)
+    if end_date:
+        query = query.where(models.UserDailyStats.day <= end_date)
+    row = (await db.execute(query)).one()
 
-    total_time = sum(s.duration_minutes for s in all_sessions)
-    total_sessions = len(all_sessions)
-    avg_session_length = sum(s.duration_minutes for s in all_sessions) / len(all_sessions) if all_sessions else 0
+    total_time = int(row.total_minutes)
+    total_sessions = int(row.total_sessions)
+    avg_session_length = total_time / total_sessions if total_sessions else 0
+    avg_quality = int(row.quality_sum) / total_sessions if total_sessions else 0
 
     return {
         "total_study_time": total_time,
         "total_sessions": total_sessions,
-        "avg_session_length": round(avg_session_length, 1)
+        "avg_session_length": round(avg_session_length, 1),
+        "avg_quality": round(avg_quality, 1)
     }
+
+@router.get("/timeseries")
+async def get_time_series(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = Query("day"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    # Reported as the first bucket's start, which build_time_series widens to
+    start = _period_start(start, granularity)
+
+    if _bucket_count(start, end, granularity) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range exceeds {MAX_BUCKETS} {granularity} buckets")
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": await build_time_series(db, current_user.id, start, end, granularity)
+    }
+
+@router.get("/weekly")
+async def get_weekly_stats(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Monday to Sunday of the current week, in the shape the dashboard chart draws
+    week_start = _period_start(datetime.now().date(), "week")
+    buckets = await build_time_series(db, current_user.id, week_start, week_start + timedelta(days=6), "day")
+
+    return [
+        {
+            "day": WEEKDAYS[index],
+            "date": bucket["period_start"],
+            "hours": round(bucket["total_minutes"] / 60, 2),
+            "sessions": bucket["session_count"]
+        }
+        for index, bucket in enumerate(buckets)
+    ]
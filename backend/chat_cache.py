@@ -0,0 +1,96 @@
+"""Cache of chatbot replies for frequently asked questions.
+
+Keys combine the normalized user message ("How does Pomodoro work?" and
+"how does pomodoro work" share an entry) with a fingerprint of the system
+prompt and model, so editing the prompt or switching models never serves a
+stale answer. Replies are stored as their original chunks so a hit replays
+over the WebSocket exactly like a live stream. Messages longer than
+CHAT_CACHE_MAX_MESSAGE_CHARS, and personalized requests, bypass the cache.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+from config import settings
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = PUNCTUATION.sub(" ", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def prompt_fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Bounded LRU of cache key -> (expiry, reply chunks), with hit/miss counters"""
+
+    def __init__(self, max_entries: int, ttl: int, max_message_chars: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_message_chars = max_message_chars
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, message: str, fingerprint: str, personalized: bool = False) -> Optional[str]:
+        """Cache key for a message, or None when the request must bypass the cache"""
+        if self.ttl <= 0 or personalized or len(message) > self.max_message_chars:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        return hashlib.sha256(f"{fingerprint}\x00{normalized}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, chunks: List[str]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, list(chunks))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    settings.CHAT_CACHE_MAX_ENTRIES,
+    settings.CHAT_CACHE_TTL_SECONDS,
+    settings.CHAT_CACHE_MAX_MESSAGE_CHARS
+)
@@ -0,0 +1,70 @@
+"""Per-connection chatbot conversation state with a prompt token budget.
+
+Each WebSocket keeps its own Conversation. Before a turn is sent, the oldest
+exchanges are dropped until the history plus the new message fit in
+CHAT_HISTORY_TOKEN_BUDGET; the questions from dropped exchanges are kept as a
+short "earlier in this conversation" note of at most CHAT_SUMMARY_TOKEN_BUDGET
+tokens, so the model keeps the thread without the full text. Token counts
+are estimated locally (about four characters per token) so trimming never
+costs an API call.
+"""
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+SUMMARY_PREFIX = "Earlier in this conversation the student asked about: "
+SUMMARY_ITEM_CHARS = 80
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class Turn:
+    role: str  # "user" or "model"
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class Conversation:
+    budget_tokens: int
+    summary_budget_tokens: int
+    turns: List[Turn] = field(default_factory=list)
+    earlier_topics: List[str] = field(default_factory=list)
+
+    @property
+    def summary(self) -> str:
+        return SUMMARY_PREFIX + "; ".join(self.earlier_topics) if self.earlier_topics else ""
+
+    def _drop_oldest_exchange(self):
+        dropped = self.turns[:2]
+        del self.turns[:2]
+        question = next((turn.text for turn in dropped if turn.role == "user"), "")
+        topic = " ".join(question.split())[:SUMMARY_ITEM_CHARS]
+        if topic:
+            self.earlier_topics.append(topic)
+        while self.earlier_topics and estimate_tokens(self.summary) > self.summary_budget_tokens:
+            self.earlier_topics.pop(0)
+
+    def prompt_turns(self, user_message: str) -> Tuple[List[Turn], int]:
+        """Turns to send for a new message, trimmed to the budget; returns (turns, exchanges dropped)"""
+        dropped = 0
+        incoming = estimate_tokens(user_message)
+        while self.turns and sum(turn.tokens for turn in self.turns) + estimate_tokens(self.summary) + incoming > self.budget_tokens:
+            self._drop_oldest_exchange()
+            dropped += 1
+
+        turns = list(self.turns)
+        if self.summary:
+            turns.insert(0, Turn("user", self.summary))
+            turns.insert(1, Turn("model", "Understood."))
+        turns.append(Turn("user", user_message))
+        return turns, dropped
+
+    def record(self, user_message: str, reply: str):
+        self.turns.append(Turn("user", user_message))
+        self.turns.append(Turn("model", reply))
@@ -1,15 +1,85 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
-    BREVO_API_KEY: str
-    FROM_EMAIL: str
-    FROM_NAME: str
-    GEMINI_API_KEY: str
+    # Optional integrations: without a key, emails wait in the outbox and the chatbot answers 503
+    BREVO_API_KEY: Optional[str] = None
+    FROM_EMAIL: Optional[str] = None
+    FROM_NAME: Optional[str] = None
+    GEMINI_API_KEY: Optional[str] = None
+
+    # Connection pools, applied to both the async engine (routes) and the sync one (workers, scripts)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30  # wait for a free connection before failing the request
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # reconnect before server or proxy idle timeouts drop connections
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # PostgreSQL only; 0 disables
+    DB_ECHO: bool = False  # log every SQL statement
+
+    # Read replicas for read-only routes; empty sends every read to the primary
+    DATABASE_REPLICA_URLS: List[str] = []
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 10  # a user's reads stay on the primary this long after a write
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5  # PostgreSQL replicas further behind are skipped
+    DATABASE_REPLICA_CHECK_SECONDS: float = 5  # probe interval, and how long a failing replica is skipped
+
+    # Shared state for multi-worker deployments (principal cache); in-process when unset
+    REDIS_URL: Optional[str] = None
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # 0 disables the cache
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing process pool; 0 workers hashes inline on the request thread
+    HASH_WORKERS: int = 2
+    HASH_MAX_PENDING: int = 8
+
+    # Token buckets per route ("<count>/<second|minute|hour|day>"), per IP and per user
+    RATE_LIMITS: Dict[str, str] = {
+        "login": "10/minute",
+        "register": "5/minute",
+        "forgot_password": "3/minute",
+        "reset_password": "5/minute",
+        "resend_verification": "3/minute",
+        "chatbot": "20/minute",
+    }
+    RATE_LIMIT_MAX_CONCURRENT: int = 32  # rate-limited requests in flight per process
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # use X-Forwarded-For behind a trusted proxy
+
+    # Chatbot upstream generation; CHAT_PROVIDER "fake" streams canned text locally (load tests)
+    CHAT_PROVIDER: str = "gemini"
+    CHAT_MODEL: str = "models/gemini-flash-latest"
+    CHAT_MAX_CONCURRENT_GENERATIONS: int = 16  # per process, across WebSockets and /message
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 10  # wait for a free slot before answering "busy"
+    FAKE_LLM_FIRST_CHUNK_MS: float = 200
+    FAKE_LLM_CHUNK_MS: float = 30
+    FAKE_LLM_CHUNK_SIZE: int = 4  # words per chunk
+    FAKE_LLM_CHUNKS: int = 40
+    FAKE_LLM_ERROR_RATE: float = 0.0
+
+    # Chatbot conversation memory, in estimated tokens (~4 characters each)
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000  # history + new message sent per turn
+    CHAT_SUMMARY_TOKEN_BUDGET: int = 150  # note standing in for trimmed exchanges
+    CHAT_MAX_MESSAGE_CHARS: int = 4000
+
+    # Study snapshot injected into grounded chat replies
+    CHAT_AUTH_TIMEOUT_SECONDS: float = 10  # WebSocket clients must send their auth frame within this
+    CHAT_SNAPSHOT_MAX_CHARS: int = 800
+    CHAT_SNAPSHOT_MAX_AGE_SECONDS: int = 300
+    CHAT_SNAPSHOT_MAX_ENTRIES: int = 10000
+
+    # Prometheus metrics at /metrics, kept per process
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None  # when set, scrapes must send "Authorization: Bearer <token>"
+    SERVER_TIMING_HEADER: bool = False  # add app, db and external-call durations to every response
+
+    # Chatbot reply cache for repeated questions
+    CHAT_CACHE_TTL_SECONDS: int = 3600  # 0 disables the cache
+    CHAT_CACHE_MAX_ENTRIES: int = 1000
+    CHAT_CACHE_MAX_MESSAGE_CHARS: int = 200  # longer messages are answered fresh
 
     class Config:
         # Go one directory up to find .env
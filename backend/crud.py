@@ -1,14 +1,30 @@
+from datetime import datetime
+import csv
+import io
+from typing import Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
-import models, schemas
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+import models, schemas, rollups
+from hashing import hashing_service
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashing_service.hash(password)
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def calculate_duration_minutes(start_time: datetime, end_time: datetime) -> int:
+    return max(0, int((end_time - start_time).total_seconds() // 60))
+
+def fill_derived_fields(db_session: models.StudySession):
+    # Stored so date filters and rollups never need func.date(start_time)
+    db_session.duration_minutes = calculate_duration_minutes(db_session.start_time, db_session.end_time)
+    db_session.study_date = db_session.start_time.date()
+
+def add_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    """Stage a new user and flush so its id is available; the caller commits.
+
+    Async callers pass a hashed_password from hashing_service.hash_async.
+    """
+    hashed_password = hashed_password or get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -18,13 +34,96 @@ def create_user(db: Session, user: schemas.UserCreate):
         user_class=user.user_class
     )
     db.add(db_user)
+    db.flush()
+    return db_user
+
+def create_user(db: Session, user: schemas.UserCreate):
+    db_user = add_user(db, user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def create_session(db: Session, session: schemas.SessionCreate):
-    db_session = models.StudySession(**session.dict())
+def add_session(db: Session, user_id: int, data):
+    """Stage a new session and its rollup change; the caller commits"""
+    db_session = models.StudySession(user_id=user_id, **data.dict(exclude={"user_id"}))
+    fill_derived_fields(db_session)
     db.add(db_session)
+    rollups.add_session(db, db_session)
+    return db_session
+
+def apply_session_update(db: Session, db_session: models.StudySession, data):
+    """Stage new values for an owned session; the caller commits"""
+    # Move the session's contribution from its old day to its new one in the same transaction
+    rollups.remove_session(db, db_session)
+    for key, value in data.dict(exclude={"user_id"}).items():
+        setattr(db_session, key, value)
+    fill_derived_fields(db_session)
+    rollups.add_session(db, db_session)
+    return db_session
+
+def remove_session(db: Session, db_session: models.StudySession):
+    """Stage deletion of an owned session; the caller commits"""
+    rollups.remove_session(db, db_session)
+    db.delete(db_session)
+
+def create_session(db: Session, session: schemas.SessionCreate):
+    db_session = add_session(db, session.user_id, session)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+def update_session(db: Session, db_session: models.StudySession, session: schemas.SessionCreate):
+    apply_session_update(db, db_session, session)
     db.commit()
     db.refresh(db_session)
-    return db_session
\ No newline at end of file
+    return db_session
+
+def delete_session(db: Session, db_session: models.StudySession):
+    remove_session(db, db_session)
+    db.commit()
+
+IMPORT_COLUMNS = [
+    "user_id", "subject", "start_time", "end_time", "study_date",
+    "duration_minutes", "quality", "percentage_completion", "notes"
+]
+
+def bulk_insert_sessions(db: Session, user_id: int, sessions: list):
+    """Insert many validated sessions and their rollups; the caller commits"""
+    rows = []
+    for session in sessions:
+        rows.append({
+            "user_id": user_id,
+            "subject": session.subject,
+            "start_time": session.start_time,
+            "end_time": session.end_time,
+            "study_date": session.start_time.date(),
+            "duration_minutes": calculate_duration_minutes(session.start_time, session.end_time),
+            "quality": session.quality,
+            "percentage_completion": session.percentage_completion,
+            "notes": session.notes,
+        })
+    if not rows:
+        return
+
+    if db.get_bind().dialect.driver == "psycopg2":
+        # COPY is several times faster than even multi-row INSERTs on PostgreSQL
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in IMPORT_COLUMNS])
+        buffer.seek(0)
+        statement = f"COPY study_sessions ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        dbapi = db.get_bind().dialect.loaded_dbapi
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(statement, buffer)
+        except dbapi.Error as e:
+            # The raw cursor bypasses SQLAlchemy, so wrap its errors the way an execute() would
+            raise DBAPIError.instance(statement, None, e, dbapi.Error)
+        finally:
+            cursor.close()
+    else:
+        # executemany; SQLAlchemy batches it into multi-row INSERT ... VALUES
+        db.execute(insert(models.StudySession), rows)
+
+    rollups.add_session_rows(db, user_id, rows)
@@ -1,14 +1,103 @@
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Routes share the async engine; workers, CLIs and the streaming import/export use the sync one
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url: str) -> str:
+    """The DATABASE_URL with its async driver, e.g. postgresql:// -> postgresql+asyncpg://"""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend == "postgres":
+        backend = "postgresql"
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}{sep}{rest}"
+
+
+def engine_options(url: str, driver: str) -> dict:
+    options = {"echo": settings.DB_ECHO}
+    if url.startswith("sqlite"):
+        # SQLite pools per file or per thread (an in-memory database is not shared between
+        # the two engines); the server-side settings below do not apply
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql"):
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if driver == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _engine(key: str, build):
+    # Built on first use: importing the app never loads a driver or opens a pool
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = build()
+        return _engines[key]
+
+
+def get_engine():
+    url = settings.DATABASE_URL
+    return _engine("sync", lambda: create_engine(url, **engine_options(url, "psycopg2")))
+
+
+def get_async_engine():
+    url = async_url(settings.DATABASE_URL)
+    return _engine("async", lambda: create_async_engine(url, **engine_options(url, "asyncpg")))
+
+
+async def dispose_engines():
+    """Close every pooled connection; the engines reconnect if used again"""
+    if "async" in _engines:
+        await _engines["async"].dispose()
+    if "sync" in _engines:
+        _engines["sync"].dispose()
+
+
+class LazySessionmaker:
+    """Called like a sessionmaker; binds to its engine when the first session is made"""
+
+    def __init__(self, factory_class, get_bind, **options):
+        self.factory_class = factory_class
+        self.get_bind = get_bind
+        self.options = options
+        self._factory = None
+
+    def __call__(self, **kw):
+        if self._factory is None:
+            self._factory = self.factory_class(self.get_bind(), **self.options)
+        return self._factory(**kw)
+
+
+SessionLocal = LazySessionmaker(sessionmaker, get_engine, autocommit=False, autoflush=False)
+# Objects stay readable after commit: an expired attribute would need a lazy load, which async cannot do
+AsyncSessionLocal = LazySessionmaker(async_sessionmaker, get_async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,5 +1,12 @@
 from email_mailer.service import EmailService, email_service
 from email_mailer.templates import EmailTemplates
-from email_mailer.tokens import TokenManager
+from email_mailer.tokens import TokenManager, TokenSweeper, build_token_sweeper
+from email_mailer.outbox import OutboxWorker, build_outbox_worker, enqueue_email
+from email_mailer.transports import build_transport, delivery_configured
 
-__all__ = ["EmailService", "email_service", "EmailTemplates", "TokenManager"]
\ No newline at end of file
+__all__ = [
+    "EmailService", "email_service", "EmailTemplates", "TokenManager",
+    "TokenSweeper", "build_token_sweeper",
+    "OutboxWorker", "build_outbox_worker", "enqueue_email", "build_transport",
+    "delivery_configured"
+]
\ No newline at end of file
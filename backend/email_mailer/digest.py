@@ -0,0 +1,174 @@
+"""Weekly progress digest emails.
+
+Each chunk of users costs one aggregate query over user_daily_stats and one
+batch call to the email provider. A weekly_digests row is written for every
+user in a chunk once the provider has accepted it, and users that already
+have a row for the week are skipped, so re-running the job for the same week
+resumes where it stopped instead of emailing anyone twice. (A crash between
+the provider call and the commit can repeat at most that one chunk.)
+
+    python -m email_mailer.digest                       # last full Monday-Sunday week
+    python -m email_mailer.digest --week 2026-10-12     # a specific week
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from models import User, UserDailyStats, WeeklyDigest
+from email_mailer.templates import EmailTemplates
+from email_mailer.transports import BatchEmail, DeliveryError
+
+DIGEST_SUBJECT = "Your StudyFlow week in review"
+
+
+@dataclass
+class DigestRun:
+    week_start: date
+    sent: int = 0
+    batches: int = 0
+    error: Optional[str] = None
+
+
+def last_full_week(today: Optional[date] = None) -> date:
+    today = today or date.today()
+    return today - timedelta(days=today.weekday() + 7)
+
+
+def week_label(week_start: date) -> str:
+    week_end = week_start + timedelta(days=6)
+    return f"{week_start:%b %d} – {week_end:%b %d, %Y}"
+
+
+def pending_digest_rows(db: Session, week_start: date, after_id: int, limit: int) -> list:
+    """Weekly totals for the next chunk of verified users still owed this week's digest"""
+    stats = UserDailyStats
+    week_end = week_start + timedelta(days=7)
+    already_sent = exists().where(
+        WeeklyDigest.user_id == User.id,
+        WeeklyDigest.week_start == week_start
+    )
+    # Pick the chunk first so the aggregate only touches these users' rows
+    chunk = select(User.id, User.email, User.username).where(
+        User.id > after_id,
+        User.is_verified == True,
+        ~already_sent
+    ).order_by(User.id).limit(limit).subquery()
+    query = select(
+        chunk.c.id,
+        chunk.c.email,
+        chunk.c.username,
+        func.coalesce(func.sum(stats.total_minutes), 0),
+        func.coalesce(func.sum(stats.session_count), 0),
+        func.count(stats.day),
+        func.coalesce(func.sum(stats.quality_sum), 0)
+    ).select_from(chunk).outerjoin(stats, and_(
+        stats.user_id == chunk.c.id,
+        stats.day >= week_start,
+        stats.day < week_end
+    )).group_by(chunk.c.id, chunk.c.email, chunk.c.username).order_by(chunk.c.id)
+    return db.execute(query).all()
+
+
+def digest_params(row, label: str) -> dict:
+    _, _, username, minutes, sessions, active_days, quality_sum = row
+    return {
+        "username": username,
+        "week_label": label,
+        "total_hours": round(minutes / 60, 1),
+        "session_count": sessions,
+        "active_days": active_days,
+        "avg_quality": round(quality_sum / sessions, 1) if sessions else "–",
+    }
+
+
+def send_weekly_digests(
+    db: Session,
+    transport,
+    week_start: date,
+    frontend_url: str,
+    sender_email: str,
+    sender_name: str,
+    chunk_size: int = 1000
+) -> DigestRun:
+    """Send the week's digest to every verified user who has not had it yet"""
+    run = DigestRun(week_start=week_start)
+    label = week_label(week_start)
+    # The template is rendered once; per-user values travel as provider params
+    html_content = EmailTemplates.weekly_digest_email(f"{frontend_url}/dashboard.html")
+    after_id = 0
+
+    while True:
+        rows = pending_digest_rows(db, week_start, after_id, chunk_size)
+        if not rows:
+            break
+        batch = BatchEmail(
+            subject=DIGEST_SUBJECT,
+            html_content=html_content,
+            recipients=[
+                {"email": row[1], "name": row[2], "params": digest_params(row, label)}
+                for row in rows
+            ],
+            sender_email=sender_email,
+            sender_name=sender_name
+        )
+        try:
+            transport.send_batch(batch)
+        except DeliveryError as e:
+            # Stop here; the next run picks up from this chunk
+            run.error = str(e)
+            break
+
+        sent_at = datetime.utcnow()
+        db.execute(insert(WeeklyDigest), [
+            {"user_id": row[0], "week_start": week_start, "sent_at": sent_at}
+            for row in rows
+        ])
+        db.commit()
+        run.sent += len(rows)
+        run.batches += 1
+        after_id = rows[-1][0]
+
+    return run
+
+
+def main():
+    from database import SessionLocal
+    from email_mailer.transports import build_transport
+
+    parser = argparse.ArgumentParser(description="Send the weekly progress digest emails")
+    parser.add_argument("--week", type=date.fromisoformat, help="Monday of the week to report (default: last full week)")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv('DIGEST_CHUNK_SIZE', '1000')),
+                        help="recipients per provider call")
+    args = parser.parse_args()
+
+    week_start = args.week or last_full_week()
+    if week_start.weekday() != 0:
+        parser.error("--week must be a Monday")
+
+    db = SessionLocal()
+    try:
+        run = send_weekly_digests(
+            db,
+            build_transport(),
+            week_start,
+            frontend_url=os.getenv('FRONTEND_URL', 'http://localhost:5500'),
+            sender_email=os.getenv('FROM_EMAIL', 'noreply@studyflow.com'),
+            sender_name=os.getenv('FROM_NAME', 'StudyFlow'),
+            chunk_size=args.chunk_size
+        )
+    finally:
+        db.close()
+
+    print(f"Week of {week_start}: {run.sent} digest(s) sent in {run.batches} batch(es)")
+    if run.error:
+        print(f"❌ Stopped early: {run.error} (re-run to resume)")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import EmailOutbox
+from email_mailer.transports import DeliveryError, OutgoingEmail
+
+
+def enqueue_email(
+    db: Session,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    to_name: Optional[str] = None
+) -> EmailOutbox:
+    """Stage an email for background delivery; it is sent only if the caller commits"""
+    message = EmailOutbox(
+        to_email=to_email,
+        to_name=to_name,
+        subject=subject,
+        html_content=html_content,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(message)
+    return message
+
+
+def clear_finished_bodies(db: Session) -> int:
+    """Blank the bodies of sent and failed emails, which may still hold live token links"""
+    result = db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status.in_(("sent", "failed")), EmailOutbox.html_content != "")
+        .values(html_content="")
+    )
+    db.commit()
+    return result.rowcount
+
+
+class OutboxWorker:
+    """Drain email_outbox in the background with retries and exponential backoff.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased for
+    lease_seconds, so several workers (or processes) can share the table and
+    a message claimed by a crashed worker is picked up again after the lease.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        transport_factory,
+        sender_email: str,
+        sender_name: str,
+        concurrency: int = 4,
+        batch_size: int = 20,
+        poll_seconds: float = 2.0,
+        max_attempts: int = 6,
+        backoff_seconds: float = 30.0,
+        lease_seconds: int = 300
+    ):
+        self.session_factory = session_factory
+        self.transport_factory = transport_factory
+        self.sender_email = sender_email
+        self.sender_name = sender_name
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self._transport = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def transport(self):
+        # Built on first delivery so a misconfigured provider never blocks startup
+        if self._transport is None:
+            self._transport = self.transport_factory()
+        return self._transport
+
+    def claim_batch(self) -> list:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            rows = db.query(EmailOutbox).filter(
+                or_(EmailOutbox.status == "pending", EmailOutbox.status == "sending"),
+                EmailOutbox.next_attempt_at <= now
+            ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            for row in rows:
+                row.status = "sending"
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            db.commit()
+            return [
+                (row.id, row.attempts, OutgoingEmail(
+                    to_email=row.to_email,
+                    to_name=row.to_name,
+                    subject=row.subject,
+                    html_content=row.html_content,
+                    sender_email=self.sender_email,
+                    sender_name=self.sender_name
+                ))
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+    def record_result(self, message_id: int, attempts: int, error: Optional[str]):
+        db = self.session_factory()
+        try:
+            row = db.get(EmailOutbox, message_id)
+            if row is None:
+                return
+            now = datetime.utcnow()
+            if error is None:
+                row.status = "sent"
+                row.sent_at = now
+                row.last_error = None
+                row.html_content = ""
+            elif attempts >= self.max_attempts:
+                row.status = "failed"
+                row.last_error = error
+                row.html_content = ""
+            else:
+                row.status = "pending"
+                row.last_error = error
+                row.next_attempt_at = now + timedelta(seconds=self.backoff_seconds * 2 ** (attempts - 1))
+            db.commit()
+        finally:
+            db.close()
+
+    def deliver(self, message: OutgoingEmail) -> Optional[str]:
+        try:
+            self.transport.send(message)
+            print(f"✅ Email sent to {message.to_email}")
+            return None
+        except (DeliveryError, ValueError) as e:
+            print(f"❌ Error sending email to {message.to_email}: {e}")
+            return str(e)
+        except Exception as e:
+            # An unexpected SDK or transport bug must not leave the message stuck in "sending"
+            print(f"❌ Unexpected error sending email to {message.to_email}: {e!r}")
+            return repr(e)
+
+    async def drain_once(self) -> int:
+        """Deliver one claimed batch; returns how many messages were attempted"""
+        batch = await run_in_threadpool(self.claim_batch)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def send(message_id: int, attempts: int, message: OutgoingEmail):
+            async with limit:
+                error = await run_in_threadpool(self.deliver, message)
+                await run_in_threadpool(self.record_result, message_id, attempts, error)
+
+        await asyncio.gather(*(send(*item) for item in batch))
+        return len(batch)
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                sent = await self.drain_once()
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                # Caught up: wait for the next poll (or a stop request)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stop(self):
+        self._stopping.set()
+
+
+def build_outbox_worker(session_factory, transport_factory) -> OutboxWorker:
+    return OutboxWorker(
+        session_factory,
+        transport_factory,
+        sender_email=os.getenv('FROM_EMAIL', 'noreply@studyflow.com'),
+        sender_name=os.getenv('FROM_NAME', 'StudyFlow'),
+        concurrency=int(os.getenv('EMAIL_OUTBOX_CONCURRENCY', '4')),
+        batch_size=int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '20')),
+        poll_seconds=float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', '2')),
+        max_attempts=int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6')),
+        backoff_seconds=float(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', '30'))
+    )
@@ -1,34 +1,30 @@
 import os
 from typing import Optional
 from dotenv import load_dotenv
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
 from sqlalchemy.orm import Session
 
+from email_mailer.outbox import enqueue_email
 from email_mailer.templates import EmailTemplates
 from email_mailer.tokens import TokenManager
+from email_mailer.transports import DeliveryError, OutgoingEmail, build_transport
 
 load_dotenv()
 
 
 class EmailService:
-    """Handle email sending via Brevo API"""
+    """Queue transactional emails in the outbox; OutboxWorker delivers them"""
     
     def __init__(self):
-        self.api_key = os.getenv('BREVO_API_KEY')
         self.from_email = os.getenv('FROM_EMAIL', 'noreply@studyflow.com')
         self.from_name = os.getenv('FROM_NAME', 'StudyFlow')
         self.frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5500')
-        
-        if not self.api_key:
-            raise ValueError("BREVO_API_KEY not found in environment variables!")
-        
-        configuration = sib_api_v3_sdk.Configuration()
-        configuration.api_key['api-key'] = self.api_key
-        
-        self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-            sib_api_v3_sdk.ApiClient(configuration)
-        )
+        self._transport = None
+    
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = build_transport()
+        return self._transport
     
     def send_email(
         self,
@@ -37,45 +33,47 @@ class EmailService:
         html_content: str,
         to_name: Optional[str] = None
     ) -> bool:
-        """Send email via Brevo API"""
+        """Send one email right away, bypassing the outbox"""
         try:
-            send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-                to=[{"email": to_email, "name": to_name or to_email}],
-                sender={"email": self.from_email, "name": self.from_name},
+            self.transport.send(OutgoingEmail(
+                to_email=to_email,
                 subject=subject,
-                html_content=html_content
-            )
-            
-            self.api_instance.send_transac_email(send_smtp_email)
+                html_content=html_content,
+                to_name=to_name,
+                sender_email=self.from_email,
+                sender_name=self.from_name
+            ))
             print(f"✅ Email sent to {to_email}")
             return True
             
-        except ApiException as e:
+        except DeliveryError as e:
             print(f"❌ Error sending email to {to_email}: {e}")
             return False
     
-    def send_verification_email(self, db: Session, user) -> bool:
-        """Send email verification link"""
+    def queue_verification_email(self, db: Session, user):
+        """Stage a verification token and its email; both are kept only if the caller commits"""
         token = TokenManager.create_verification_token(db, user.id)
         verify_link = f"{self.frontend_url}/verify-email.html?token={token}"
         
         html_content = EmailTemplates.verification_email(user.username, verify_link)
         
-        return self.send_email(
+        return enqueue_email(
+            db,
             to_email=user.email,
             subject="Verify your StudyFlow account",
             html_content=html_content,
             to_name=user.username
         )
     
-    def send_password_reset_email(self, db: Session, user) -> bool:
-        """Send password reset link"""
+    def queue_password_reset_email(self, db: Session, user):
+        """Stage a password reset token and its email; both are kept only if the caller commits"""
         token = TokenManager.create_password_reset_token(db, user.id)
         reset_link = f"{self.frontend_url}/reset-password.html?token={token}"
         
         html_content = EmailTemplates.password_reset_email(user.username, reset_link)
         
-        return self.send_email(
+        return enqueue_email(
+            db,
             to_email=user.email,
             subject="Reset your StudyFlow password",
             html_content=html_content,
@@ -84,4 +82,4 @@ class EmailService:
 
 
 # Create global instance
-email_service = EmailService()
\ No newline at end of file
+email_service = EmailService()
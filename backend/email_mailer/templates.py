@@ -134,4 +134,84 @@ class EmailTemplates:
     </table>
 </body>
 </html>
-        """
\ No newline at end of file
+        """
+    
+    @staticmethod
+    def weekly_digest_email(dashboard_link: str) -> str:
+        """Generate the weekly digest HTML, shared by every recipient of a batch.
+
+        Per-user values are Brevo-style {{ params.name }} placeholders filled in
+        by the provider (or by transports.render_params for local transports).
+        """
+        return f"""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Your Week in Review</title>
+</head>
+<body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
+    <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f4f4f4; padding: 20px;">
+        <tr>
+            <td align="center">
+                <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                    <tr>
+                        <td style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 40px 30px; text-align: center;">
+                            <h1 style="margin: 0; color: #ffffff; font-size: 28px;">
+                                📈 Your Week in Review
+                            </h1>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="padding: 40px 30px;">
+                            <h2 style="margin: 0 0 20px 0; color: #333333; font-size: 22px;">
+                                {{{{ params.week_label }}}}
+                            </h2>
+                            <p style="margin: 0 0 20px 0; color: #666666; font-size: 16px; line-height: 1.6;">
+                                Hi <strong>{{{{ params.username }}}}</strong>,
+                            </p>
+                            <p style="margin: 0 0 30px 0; color: #666666; font-size: 16px; line-height: 1.6;">
+                                Here is how your studying went this week:
+                            </p>
+                            <table width="100%" cellpadding="0" cellspacing="0" style="margin: 0 0 30px 0;">
+                                <tr>
+                                    <td align="center" style="padding: 10px; color: #333333; font-size: 16px;">
+                                        <strong style="font-size: 24px; color: #667eea;">{{{{ params.total_hours }}}}</strong><br>hours studied
+                                    </td>
+                                    <td align="center" style="padding: 10px; color: #333333; font-size: 16px;">
+                                        <strong style="font-size: 24px; color: #667eea;">{{{{ params.session_count }}}}</strong><br>sessions
+                                    </td>
+                                    <td align="center" style="padding: 10px; color: #333333; font-size: 16px;">
+                                        <strong style="font-size: 24px; color: #667eea;">{{{{ params.active_days }}}}</strong><br>active days
+                                    </td>
+                                    <td align="center" style="padding: 10px; color: #333333; font-size: 16px;">
+                                        <strong style="font-size: 24px; color: #667eea;">{{{{ params.avg_quality }}}}</strong><br>avg. quality
+                                    </td>
+                                </tr>
+                            </table>
+                            <table width="100%" cellpadding="0" cellspacing="0">
+                                <tr>
+                                    <td align="center" style="padding: 20px 0;">
+                                        <a href="{dashboard_link}" style="display: inline-block; padding: 16px 40px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: #ffffff; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; box-shadow: 0 4px 6px rgba(102, 126, 234, 0.3);">
+                                            Open Dashboard
+                                        </a>
+                                    </td>
+                                </tr>
+                            </table>
+                        </td>
+                    </tr>
+                    <tr>
+                        <td style="background-color: #f8f9fa; padding: 30px; text-align: center; border-top: 1px solid #e9ecef;">
+                            <p style="margin: 0 0 10px 0; color: #999999; font-size: 12px;">
+                                The StudyFlow Team
+                            </p>
+                        </td>
+                    </tr>
+                </table>
+            </td>
+        </tr>
+    </table>
+</body>
+</html>
+        """
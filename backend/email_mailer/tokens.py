@@ -1,47 +1,138 @@
+import asyncio
+import hashlib
+import os
 import secrets
 from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, or_, select, update
 from sqlalchemy.orm import Session
-from models import PasswordReset, EmailVerification 
+from starlette.concurrency import run_in_threadpool
+from models import PasswordReset, EmailVerification
+from email_mailer.outbox import clear_finished_bodies
 
 
 class TokenManager:
-    """Handle token generation and validation"""
-    
+    """Handle token generation and validation.
+
+    Only the SHA-256 of each token is stored, so a leaked table cannot be
+    replayed as verification or reset links.
+    """
+
     @staticmethod
     def generate_token() -> str:
         """Generate secure random token"""
         return secrets.token_urlsafe(32)
-    
+
     @staticmethod
-    def create_verification_token(db: Session, user_id: int) -> str:
-        """Create and save email verification token"""
-        
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _create(db: Session, model, user_id: int, lifetime: timedelta) -> str:
         token = TokenManager.generate_token()
-        expires_at = datetime.utcnow() + timedelta(hours=24)
-        
-        verification = EmailVerification(
+        db.add(model(
             user_id=user_id,
-            token=token,
-            expires_at=expires_at,
+            token_hash=TokenManager.hash_token(token),
+            expires_at=datetime.utcnow() + lifetime,
             is_used=False
-        )
-        db.add(verification)
-        db.commit()
+        ))
         return token
-    
+
     @staticmethod
-    def create_password_reset_token(db: Session, user_id: int) -> str:
-        """Create and save password reset token"""
-        
-        token = TokenManager.generate_token()
-        expires_at = datetime.utcnow() + timedelta(hours=1)
-        
-        reset = PasswordReset(
-            user_id=user_id,
-            token=token,
-            expires_at=expires_at,
-            is_used=False
+    def _consume(db: Session, model, token: str) -> Optional[int]:
+        # Check and mark used in one statement: a token can only ever be redeemed once
+        result = db.execute(
+            update(model).where(
+                model.token_hash == TokenManager.hash_token(token),
+                model.is_used == False,
+                model.expires_at > datetime.utcnow()
+            ).values(is_used=True).returning(model.user_id)
         )
-        db.add(reset)
-        db.commit()
-        return token
\ No newline at end of file
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def create_verification_token(db: Session, user_id: int) -> str:
+        """Stage an email verification token; the caller commits"""
+        return TokenManager._create(db, EmailVerification, user_id, timedelta(hours=24))
+
+    @staticmethod
+    def create_password_reset_token(db: Session, user_id: int) -> str:
+        """Stage a password reset token; the caller commits"""
+        return TokenManager._create(db, PasswordReset, user_id, timedelta(hours=1))
+
+    @staticmethod
+    def consume_verification_token(db: Session, token: str) -> Optional[int]:
+        """Mark a live verification token used and return its user id (None if invalid); the caller commits"""
+        return TokenManager._consume(db, EmailVerification, token)
+
+    @staticmethod
+    def consume_password_reset_token(db: Session, token: str) -> Optional[int]:
+        """Mark a live reset token used and return its user id (None if invalid); the caller commits"""
+        return TokenManager._consume(db, PasswordReset, token)
+
+    @staticmethod
+    def sweep(db: Session, batch_size: int = 1000) -> int:
+        """Delete used or expired tokens in batches, committing after each; returns rows deleted"""
+        now = datetime.utcnow()
+        deleted = 0
+        for model in (EmailVerification, PasswordReset):
+            last_id = 0
+            while True:
+                # Walk the primary key so every batch is a short index range, not a rescan
+                ids = db.execute(
+                    select(model.id).where(
+                        model.id > last_id,
+                        or_(model.is_used == True, model.expires_at <= now)
+                    ).order_by(model.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.execute(delete(model).where(model.id.in_(ids)))
+                db.commit()
+                deleted += len(ids)
+                last_id = ids[-1]
+        return deleted
+
+
+class TokenSweeper:
+    """Run TokenManager.sweep every interval_seconds in the background, also blanking finished outbox bodies"""
+
+    def __init__(self, session_factory, interval_seconds: float = 3600, batch_size: int = 1000):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._stopping = asyncio.Event()
+
+    def sweep(self) -> int:
+        db = self.session_factory()
+        try:
+            deleted = TokenManager.sweep(db, self.batch_size)
+            # Also catches bodies of emails that finished before record_result started blanking them
+            clear_finished_bodies(db)
+            return deleted
+        finally:
+            db.close()
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                deleted = await run_in_threadpool(self.sweep)
+                if deleted:
+                    print(f"Token sweeper removed {deleted} used or expired token(s)")
+            except Exception as e:
+                print(f"Token sweeper error: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self._stopping.set()
+
+
+def build_token_sweeper(session_factory) -> TokenSweeper:
+    return TokenSweeper(
+        session_factory,
+        interval_seconds=float(os.getenv('TOKEN_SWEEP_INTERVAL_SECONDS', '3600')),
+        batch_size=int(os.getenv('TOKEN_SWEEP_BATCH_SIZE', '1000'))
+    )
@@ -0,0 +1,181 @@
+import html
+import json
+import os
+import re
+import smtplib
+import uuid
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from pathlib import Path
+from typing import List, Optional
+
+from metrics import external_call
+
+PARAM_PATTERN = re.compile(r"\{\{\s*params\.(\w+)\s*\}\}")
+
+
+class DeliveryError(Exception):
+    """Raised by a transport when a message could not be handed to the provider"""
+
+
+@dataclass
+class OutgoingEmail:
+    to_email: str
+    subject: str
+    html_content: str
+    to_name: Optional[str] = None
+    sender_email: str = "noreply@studyflow.com"
+    sender_name: str = "StudyFlow"
+    headers: dict = field(default_factory=dict)
+
+
+@dataclass
+class BatchEmail:
+    """One subject and HTML template sent to many recipients, each with their own params.
+
+    recipients are dicts with "email", "name" and "params" keys.
+    """
+    subject: str
+    html_content: str
+    recipients: List[dict]
+    sender_email: str = "noreply@studyflow.com"
+    sender_name: str = "StudyFlow"
+
+
+def render_params(template: str, params: dict) -> str:
+    """Fill {{ params.name }} placeholders the way Brevo does, for transports that render locally"""
+    return PARAM_PATTERN.sub(lambda match: html.escape(str(params.get(match.group(1), ""))), template)
+
+
+def expand_batch(batch: BatchEmail):
+    for recipient in batch.recipients:
+        yield OutgoingEmail(
+            to_email=recipient["email"],
+            to_name=recipient.get("name"),
+            subject=batch.subject,
+            html_content=render_params(batch.html_content, recipient.get("params", {})),
+            sender_email=batch.sender_email,
+            sender_name=batch.sender_name
+        )
+
+
+class BrevoTransport:
+    """Deliver through Brevo's transactional email API"""
+
+    def __init__(self, api_key: str):
+        import sib_api_v3_sdk
+
+        if not api_key:
+            raise ValueError("BREVO_API_KEY not found in environment variables!")
+
+        configuration = sib_api_v3_sdk.Configuration()
+        configuration.api_key['api-key'] = api_key
+        self._sdk = sib_api_v3_sdk
+        self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
+            sib_api_v3_sdk.ApiClient(configuration)
+        )
+
+    def send(self, message: OutgoingEmail):
+        from sib_api_v3_sdk.rest import ApiException
+
+        send_smtp_email = self._sdk.SendSmtpEmail(
+            to=[{"email": message.to_email, "name": message.to_name or message.to_email}],
+            sender={"email": message.sender_email, "name": message.sender_name},
+            subject=message.subject,
+            html_content=message.html_content,
+            headers=message.headers or None
+        )
+        try:
+            with external_call("brevo", "send"):
+                self.api_instance.send_transac_email(send_smtp_email)
+        except ApiException as e:
+            raise DeliveryError(f"Brevo API error {e.status}: {e.reason}") from e
+
+    def send_batch(self, batch: BatchEmail):
+        """One API call for the whole batch: a shared template plus one message version per recipient"""
+        from sib_api_v3_sdk.rest import ApiException
+
+        send_smtp_email = self._sdk.SendSmtpEmail(
+            sender={"email": batch.sender_email, "name": batch.sender_name},
+            subject=batch.subject,
+            html_content=batch.html_content,
+            message_versions=[
+                self._sdk.SendSmtpEmailMessageVersions(
+                    to=[{"email": recipient["email"], "name": recipient.get("name") or recipient["email"]}],
+                    params=recipient.get("params", {})
+                )
+                for recipient in batch.recipients
+            ]
+        )
+        try:
+            with external_call("brevo", "send_batch"):
+                self.api_instance.send_transac_email(send_smtp_email)
+        except ApiException as e:
+            raise DeliveryError(f"Brevo API error {e.status}: {e.reason}") from e
+
+
+class FileTransport:
+    """Write each message as a JSON file; a local stand-in for development and tests"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def send(self, message: OutgoingEmail):
+        path = self.directory / f"{uuid.uuid4().hex}.json"
+        path.write_text(json.dumps(message.__dict__, indent=2))
+
+    def send_batch(self, batch: BatchEmail):
+        # One JSON-lines file per batch keeps large digest runs to a handful of files
+        path = self.directory / f"batch-{uuid.uuid4().hex}.jsonl"
+        with path.open("w") as output:
+            for message in expand_batch(batch):
+                output.write(json.dumps(message.__dict__) + "\n")
+
+
+class SmtpTransport:
+    """Deliver over plain SMTP, e.g. to a local sink such as `python -m aiosmtpd -n`"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    def send(self, message: OutgoingEmail):
+        self._deliver([message])
+
+    def send_batch(self, batch: BatchEmail):
+        self._deliver(expand_batch(batch))
+
+    @staticmethod
+    def _build(message: OutgoingEmail) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = f"{message.sender_name} <{message.sender_email}>"
+        email["To"] = f"{message.to_name} <{message.to_email}>" if message.to_name else message.to_email
+        email["Subject"] = message.subject
+        for name, value in message.headers.items():
+            email[name] = value
+        email.set_content(message.html_content, subtype="html")
+        return email
+
+    def _deliver(self, messages):
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as client:
+                for message in messages:
+                    client.send_message(self._build(message))
+        except (OSError, smtplib.SMTPException) as e:
+            raise DeliveryError(f"SMTP error: {e}") from e
+
+
+def delivery_configured() -> bool:
+    """False when EMAIL_TRANSPORT is brevo (the default) but BREVO_API_KEY is unset"""
+    return os.getenv('EMAIL_TRANSPORT', 'brevo').lower() in ("file", "smtp") or bool(os.getenv('BREVO_API_KEY'))
+
+
+def build_transport():
+    """Pick the transport named by EMAIL_TRANSPORT (brevo, file or smtp)"""
+    name = os.getenv('EMAIL_TRANSPORT', 'brevo').lower()
+    if name == "file":
+        return FileTransport(os.getenv('EMAIL_FILE_DIR', 'sent_emails'))
+    if name == "smtp":
+        return SmtpTransport(os.getenv('SMTP_HOST', 'localhost'), int(os.getenv('SMTP_PORT', '1025')))
+    return BrevoTransport(os.getenv('BREVO_API_KEY'))
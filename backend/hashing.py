@@ -0,0 +1,119 @@
+"""Password hashing off the request threadpool.
+
+Argon2 is deliberately slow. Running it on FastAPI's shared threadpool lets
+a burst of logins occupy every thread, so cheap requests queue behind it.
+HashingService runs hashes in a small process pool and admits at most
+HASH_WORKERS + HASH_MAX_PENDING calls at once; anything beyond that fails
+fast with HashingSaturated (served as 503) instead of holding a thread.
+Async routes use hash_async/verify_and_update_async, which await the pool
+without holding any thread. With HASH_WORKERS=0 there is no pool: sync
+callers hash in their own thread and async callers on the threadpool.
+"""
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# The single context for every password: argon2 for new hashes, bcrypt still verifies
+pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # new hash is returned when the stored one uses stale parameters or a deprecated scheme
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class HashingSaturated(Exception):
+    """Raised when every hashing slot is busy"""
+
+
+class HashingService:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.capacity = max(workers, 1) + max_pending
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise HashingSaturated()
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _run(self, fn, *args):
+        self._admit()
+        try:
+            if self.workers <= 0:
+                # HASH_WORKERS=0 hashes in the calling thread (tests, single-user setups)
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._release()
+
+    async def _run_async(self, fn, *args):
+        # Awaits the worker process without holding a thread, for async routes
+        self._admit()
+        try:
+            if self.workers <= 0:
+                # No pool, but Argon2 must still stay off the event loop
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._release()
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls admitted but waiting for a free worker process"""
+        return max(0, self.in_flight - max(self.workers, 1))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+        }
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        return self._run(_verify_and_update, password, hashed)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(_hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        return await self._run_async(_verify_and_update, password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hashing_service = HashingService(settings.HASH_WORKERS, settings.HASH_MAX_PENDING)
@@ -0,0 +1,163 @@
+"""Chat model providers behind the chatbot router.
+
+CHAT_PROVIDER picks the implementation: "gemini" for the real model, or
+"fake" for a deterministic local stand-in used in load tests and benchmarks
+so they never call a paid API. Both expose the same two coroutines:
+
+    async for text in provider.stream(turns, system_instruction, usage): ...
+    text = await provider.generate(turns, system_instruction)
+
+turns is the conversation as chat_memory.Turn objects ending with the new
+user message. When given a usage dict, stream() fills in prompt_tokens
+(and "estimated" when the count is not the provider's own).
+"""
+import asyncio
+import hashlib
+import random
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional
+
+from chat_memory import Turn, estimate_tokens
+from config import settings
+from metrics import external_call
+
+WORDS = (
+    "focus", "review", "your", "notes", "in", "short", "blocks", "then", "take", "a",
+    "break", "spaced", "repetition", "helps", "long", "term", "memory", "try", "the",
+    "pomodoro", "technique", "and", "track", "each", "session", "to", "see", "progress",
+)
+
+
+class ProviderError(Exception):
+    """The provider failed to produce a reply"""
+
+
+class ProviderNotConfigured(ProviderError):
+    """The selected provider has no credentials, so the chatbot stays disabled"""
+
+
+def estimate_prompt_tokens(turns: List[Turn], system_instruction: Optional[str]) -> int:
+    return estimate_tokens(system_instruction or "") + sum(turn.tokens for turn in turns)
+
+
+class LLMProvider(ABC):
+    @abstractmethod
+    async def stream(
+        self,
+        turns: List[Turn],
+        system_instruction: Optional[str] = None,
+        usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield
+
+    async def generate(self, turns: List[Turn], system_instruction: Optional[str] = None) -> str:
+        return "".join([text async for text in self.stream(turns, system_instruction)])
+
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, api_key: str, model: str):
+        from google.genai import Client, types
+
+        self.client = Client(api_key=api_key)
+        self.model = model
+        self.types = types
+
+    def _request(self, turns: List[Turn], system_instruction: Optional[str]) -> dict:
+        # The system prompt travels once as system_instruction, not glued onto every message
+        return {
+            "model": self.model,
+            "contents": [
+                self.types.Content(role=turn.role, parts=[self.types.Part(text=turn.text)])
+                for turn in turns
+            ],
+            "config": self.types.GenerateContentConfig(system_instruction=system_instruction),
+        }
+
+    async def stream(
+        self,
+        turns: List[Turn],
+        system_instruction: Optional[str] = None,
+        usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        if usage is not None:
+            # Replaced by Gemini's own count when the stream reports usage_metadata
+            usage["prompt_tokens"] = estimate_prompt_tokens(turns, system_instruction)
+            usage["estimated"] = True
+        with external_call("gemini", "stream"):
+            response_stream = await self.client.aio.models.generate_content_stream(
+                **self._request(turns, system_instruction)
+            )
+            async for chunk in response_stream:
+                if usage is not None and chunk.usage_metadata and chunk.usage_metadata.prompt_token_count:
+                    usage["prompt_tokens"] = chunk.usage_metadata.prompt_token_count
+                    usage["estimated"] = False
+                if chunk.text:
+                    yield chunk.text
+
+    async def generate(self, turns: List[Turn], system_instruction: Optional[str] = None) -> str:
+        with external_call("gemini", "generate"):
+            response = await self.client.aio.models.generate_content(**self._request(turns, system_instruction))
+        return response.text
+
+
+class FakeProvider(LLMProvider):
+    """Streams a reply derived from the last message, so the same question always gets the same text.
+
+    first_chunk_ms and chunk_ms simulate model latency; error_rate is the share
+    of replies that fail before their first chunk, drawn from a seeded RNG.
+    """
+
+    def __init__(
+        self,
+        first_chunk_ms: float = 200,
+        chunk_ms: float = 30,
+        chunk_size: int = 4,
+        chunks: int = 40,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+        self.chunk_size = chunk_size
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self._errors = random.Random(seed)
+
+    def reply_words(self, prompt: str) -> list:
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        return [rng.choice(WORDS) for _ in range(self.chunks * self.chunk_size)]
+
+    async def stream(
+        self,
+        turns: List[Turn],
+        system_instruction: Optional[str] = None,
+        usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        if usage is not None:
+            usage["prompt_tokens"] = estimate_prompt_tokens(turns, system_instruction)
+            usage["estimated"] = True
+        words = self.reply_words(turns[-1].text)
+        await asyncio.sleep(self.first_chunk_ms / 1000)
+        if self.error_rate and self._errors.random() < self.error_rate:
+            raise ProviderError("fake provider error")
+        for i in range(0, len(words), self.chunk_size):
+            if i:
+                await asyncio.sleep(self.chunk_ms / 1000)
+            yield " ".join(words[i:i + self.chunk_size]) + " "
+
+
+def build_provider() -> LLMProvider:
+    if settings.CHAT_PROVIDER == "fake":
+        return FakeProvider(
+            first_chunk_ms=settings.FAKE_LLM_FIRST_CHUNK_MS,
+            chunk_ms=settings.FAKE_LLM_CHUNK_MS,
+            chunk_size=settings.FAKE_LLM_CHUNK_SIZE,
+            chunks=settings.FAKE_LLM_CHUNKS,
+            error_rate=settings.FAKE_LLM_ERROR_RATE
+        )
+    if settings.CHAT_PROVIDER != "gemini":
+        raise ValueError(f"Unknown CHAT_PROVIDER: {settings.CHAT_PROVIDER}")
+    if not settings.GEMINI_API_KEY:
+        raise ProviderNotConfigured("GEMINI_API_KEY is not set")
+    return GeminiProvider(settings.GEMINI_API_KEY, settings.CHAT_MODEL)
@@ -1,33 +1,95 @@
-from fastapi import FastAPI
-from database import engine, Base
-import models
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import SessionLocal, dispose_engines
 from fastapi.middleware.cors import CORSMiddleware
+from hashing import HashingSaturated, hashing_service
+from email_mailer.outbox import build_outbox_worker
+from email_mailer.transports import build_transport, delivery_configured
+from email_mailer.tokens import build_token_sweeper
+from metrics import MetricsMiddleware, install_sql_hooks, router as metrics_router
+from replicas import ReplicaMonitor, replica_router
+from config import settings
 from api.routers import auth, sessions, profile, stats, chatbot
 
 
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:5000",
-        "http://localhost:5500",
-        "http://127.0.0.1:5500",
-        "http://localhost:8000",
-        "http://localhost:8080",
-    ],
-    allow_credentials=True,
-
-    allow_methods=["*"],
-    allow_headers=["*"]
-)
-
-# Prefix all routes with /api
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
-app.include_router(profile.router, prefix="/api/profile", tags=["profile"])
-app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
-app.include_router(chatbot.router, prefix="/api/chatbot", tags=["chatbot"])
\ No newline at end of file
+# The schema is owned by Alembic: run `alembic upgrade head` before starting the app.
+# Engines, the chat provider and the email client are all created on first use.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = []
+    # Every process may run a worker: rows are claimed with SKIP LOCKED
+    if os.getenv('EMAIL_OUTBOX_WORKER', '1') != '0':
+        if delivery_configured():
+            workers.append(build_outbox_worker(SessionLocal, build_transport))
+        else:
+            print("BREVO_API_KEY is not set: emails stay queued in the outbox until it is")
+    if os.getenv('TOKEN_SWEEPER', '1') != '0':
+        workers.append(build_token_sweeper(SessionLocal))
+    if replica_router.replicas:
+        workers.append(ReplicaMonitor(replica_router, settings.DATABASE_REPLICA_CHECK_SECONDS))
+    tasks = [asyncio.create_task(worker.run()) for worker in workers]
+    yield
+    for worker in workers:
+        worker.stop()
+    await asyncio.gather(*tasks)
+    hashing_service.shutdown()
+    await replica_router.dispose()
+    await dispose_engines()
+
+
+def hashing_saturated_handler(request: Request, exc: HashingSaturated):
+    # Shed load instead of queueing more password hashes behind a full pool
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+
+ALLOWED_ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:5000",
+    "http://localhost:5500",
+    "http://127.0.0.1:5500",
+    "http://localhost:8000",
+    "http://localhost:8080",
+]
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_credentials=True,
+
+        allow_methods=["*"],
+        allow_headers=["*"]
+    )
+    if settings.METRICS_ENABLED:
+        install_sql_hooks()
+        # Added last so it is outermost and times CORS and error handling too
+        app.add_middleware(
+            MetricsMiddleware,
+            server_timing=settings.SERVER_TIMING_HEADER,
+            timing_origins=tuple(ALLOWED_ORIGINS)
+        )
+        app.include_router(metrics_router, tags=["metrics"])
+
+    app.add_exception_handler(HashingSaturated, hashing_saturated_handler)
+
+    # Prefix all routes with /api
+    app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
+    app.include_router(profile.router, prefix="/api/profile", tags=["profile"])
+    app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+    app.include_router(chatbot.router, prefix="/api/chatbot", tags=["chatbot"])
+    return app
+
+
+app = create_app()
@@ -0,0 +1,339 @@
+"""Request, SQL and external-call instrumentation, exposed at /metrics.
+
+MetricsMiddleware times every HTTP request and counts its responses by
+route template (``/api/sessions/{session_id}``, never the raw path) and
+status. SQLAlchemy cursor events, registered on the Engine class so they
+cover the lazily built primary, async and replica engines alike, time each
+statement. Queries made while serving a request are also added to that
+request's totals, so an N+1 shows up in http_request_db_queries for its
+route. Gemini and Brevo calls are wrapped in ``external_call``. The
+password-hashing pool's queue, the chatbot reply cache's counters and the
+rate limiter's rejections are sampled when /metrics is scraped.
+
+GET /metrics returns everything in the Prometheus text format. With
+METRICS_TOKEN set, scrapes must send it as a bearer token. With
+SERVER_TIMING_HEADER on, API responses carry a Server-Timing header
+(app, db, and one entry per external service) that the browser's devtools
+and PerformanceResourceTiming.serverTiming can read.
+
+Metrics are kept per process. When running several uvicorn workers, give
+each its own port so every worker can be scraped.
+"""
+import asyncio
+import bisect
+import hmac
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import settings
+from chat_cache import response_cache
+from hashing import hashing_service
+from rate_limit import rate_limiter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SQL_OPERATIONS = {"select", "insert", "update", "delete"}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    bucket = _labels(self.labelnames, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Sampled:
+    """A value read from its owner at scrape time: a gauge such as a queue's depth, or a counter the owner keeps"""
+
+    def __init__(self, name: str, help: str, read, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {_number(self.read())}",
+        ]
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP responses by route template and status", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request", ("method", "route")
+)
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements run while serving one request", ("method", "route"),
+    QUERY_COUNT_BUCKETS
+)
+HTTP_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in SQL while serving one request", ("method", "route"), QUERY_BUCKETS
+)
+DB_QUERIES = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, requests and background workers alike",
+    ("operation",), QUERY_BUCKETS
+)
+EXTERNAL_CALLS = Histogram(
+    "external_call_duration_seconds", "Calls to third-party APIs", ("service", "operation", "outcome"),
+    EXTERNAL_BUCKETS
+)
+HASH_QUEUE_DEPTH = Sampled(
+    "password_hash_queue_depth", "Password hashes admitted but waiting for a free worker process",
+    lambda: hashing_service.queue_depth
+)
+HASH_IN_FLIGHT = Sampled(
+    "password_hash_in_flight", "Password hashes queued or running", lambda: hashing_service.in_flight
+)
+HASH_REJECTED = Sampled(
+    "password_hash_rejected_total", "Password hashes refused because the hashing pool was full",
+    lambda: hashing_service.rejected, "counter"
+)
+CHAT_CACHE_HITS = Sampled(
+    "chat_cache_hits_total", "Chatbot replies served from the reply cache", lambda: response_cache.hits, "counter"
+)
+CHAT_CACHE_MISSES = Sampled(
+    "chat_cache_misses_total", "Cacheable chatbot messages that had to be generated",
+    lambda: response_cache.misses, "counter"
+)
+CHAT_CACHE_BYPASSED = Sampled(
+    "chat_cache_bypassed_total", "Personal, follow-up or long chatbot messages that skipped the reply cache",
+    lambda: response_cache.bypassed, "counter"
+)
+CHAT_CACHE_EVICTIONS = Sampled(
+    "chat_cache_evictions_total", "Replies dropped to keep the cache under CHAT_CACHE_MAX_ENTRIES",
+    lambda: response_cache.evictions, "counter"
+)
+RATE_LIMIT_REJECTED = Sampled(
+    "rate_limit_rejected_total", "Requests answered 429 by the rate limiter or its concurrency cap",
+    lambda: rate_limiter.rejected, "counter"
+)
+RATE_LIMIT_IN_FLIGHT = Sampled(
+    "rate_limit_in_flight", "Rate-limited requests currently holding a concurrency slot",
+    lambda: rate_limiter.in_flight
+)
+REGISTRY = [
+    HTTP_REQUESTS, HTTP_LATENCY, HTTP_DB_QUERIES, HTTP_DB_TIME, DB_QUERIES, EXTERNAL_CALLS,
+    HASH_QUEUE_DEPTH, HASH_IN_FLIGHT, HASH_REJECTED,
+    CHAT_CACHE_HITS, CHAT_CACHE_MISSES, CHAT_CACHE_BYPASSED, CHAT_CACHE_EVICTIONS,
+    RATE_LIMIT_REJECTED, RATE_LIMIT_IN_FLIGHT,
+]
+
+
+@dataclass
+class RequestTimings:
+    queries: int = 0
+    db_seconds: float = 0.0
+    external: dict = field(default_factory=dict)  # service -> seconds
+
+    def server_timing(self, app_seconds: float) -> str:
+        entries = [
+            f"app;dur={app_seconds * 1000:.1f}",
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        entries.extend(f"{service};dur={seconds * 1000:.1f}" for service, seconds in self.external.items())
+        return ", ".join(entries)
+
+
+# Shared by reference with threadpool dependencies, which run in a copy of the request's context
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    DB_QUERIES.observe(elapsed, operation if operation in SQL_OPERATIONS else "other")
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_seconds += elapsed
+
+
+def install_sql_hooks():
+    """Time statements on every Engine, including ones built after this call"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class external_call:
+    """Time a third-party call: ``with external_call("brevo", "send"): ...``"""
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            # The caller stopped reading, e.g. the chat client disconnected mid-stream
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        EXTERNAL_CALLS.observe(elapsed, self.service, self.operation, outcome)
+        timings = _current.get()
+        if timings is not None:
+            timings.external[self.service] = timings.external.get(self.service, 0.0) + elapsed
+        return False
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses and the request's context pass through untouched"""
+
+    def __init__(self, app, server_timing: bool = False, timing_origins: tuple = ()):
+        self.app = app
+        self.server_timing = server_timing
+        self.timing_origins = set(timing_origins)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        reset = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing(time.perf_counter() - started))
+                    # Cross-origin pages can only read Server-Timing when this names them
+                    origin = Headers(scope=scope).get("origin")
+                    if origin in self.timing_origins:
+                        headers.append("Timing-Allow-Origin", origin)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(reset)
+            elapsed = time.perf_counter() - started
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_LATENCY.observe(elapsed, method, route)
+            HTTP_DB_QUERIES.observe(timings.queries, method, route)
+            HTTP_DB_TIME.observe(timings.db_seconds, method, route)
+
+
+def route_template(scope) -> str:
+    """The matched route with its parameters put back, e.g. /api/sessions/{session_id}"""
+    if scope.get("route") is None:
+        # Unmatched paths share one label so scanners cannot blow up the series count
+        return "unmatched"
+    # Rebuilt from the path rather than read off the route, whose path lacks the include_router prefix
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join("{%s}" % names[part] if part in names else part for part in scope["path"].split("/"))
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
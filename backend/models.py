@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from sqlalchemy import Boolean, Column, Integer, Date, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, Date, String, Text, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -24,10 +24,17 @@ class User(Base):
 
 class EmailVerification(Base):
     __tablename__ = "email_verifications"
+    __table_args__ = (
+        # Only live tokens are ever looked up; used ones wait for the sweeper
+        Index(
+            "ix_email_verifications_unused_token_hash", "token_hash", unique=True,
+            postgresql_where=text("NOT is_used"), sqlite_where=text("NOT is_used")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    token = Column(String, unique=True, index=True, nullable=False)
+    token_hash = Column(String(64), nullable=False)  # sha256 hex of the emailed token
     expires_at = Column(DateTime, nullable=False)
     is_used = Column(Boolean, default=False)
 
@@ -36,10 +43,17 @@ class EmailVerification(Base):
 
 class PasswordReset(Base):
     __tablename__ = "password_resets"
+    __table_args__ = (
+        # Only live tokens are ever looked up; used ones wait for the sweeper
+        Index(
+            "ix_password_resets_unused_token_hash", "token_hash", unique=True,
+            postgresql_where=text("NOT is_used"), sqlite_where=text("NOT is_used")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    token = Column(String, unique=True, index=True, nullable=False)
+    token_hash = Column(String(64), nullable=False)  # sha256 hex of the emailed token
     expires_at = Column(DateTime, nullable=False)
     is_used = Column(Boolean, default=False)
 
@@ -48,12 +62,58 @@ class PasswordReset(Base):
     
 class StudySession(Base):
     __tablename__ = "study_sessions"
+    __table_args__ = (
+        Index("ix_study_sessions_user_id_start_time", "user_id", "start_time"),
+        Index("ix_study_sessions_user_id_study_date", "user_id", "study_date"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     start_time = Column(DateTime)
+    study_date = Column(Date)  # start_time's calendar day, filled in at write time
     subject = Column(String)
     end_time = Column(DateTime)
     duration_minutes = Column(Integer)
     quality = Column(Integer)
     percentage_completion = Column(Integer)
-    notes = Column(String, nullable=True)
\ No newline at end of file
+    notes = Column(String, nullable=True)
+
+
+class UserDailyStats(Base):
+    """Per-user, per-day totals kept in step with study_sessions on every write"""
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total_minutes = Column(Integer, nullable=False, default=0)
+    session_count = Column(Integer, nullable=False, default=0)
+    quality_sum = Column(Integer, nullable=False, default=0)
+    completion_sum = Column(Integer, nullable=False, default=0)
+
+class EmailOutbox(Base):
+    """Emails waiting for (or done with) background delivery; see email_mailer.outbox"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    to_name = Column(String, nullable=True)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class WeeklyDigest(Base):
+    """One row per user and week once that week's digest email has been handed to the provider"""
+    __tablename__ = "weekly_digests"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    sent_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,126 @@
+"""Short-lived cache of authenticated users, keyed by user id and token.
+
+get_current_user would otherwise run a users query on every request. Entries
+expire after PRINCIPAL_CACHE_TTL_SECONDS and are dropped explicitly whenever
+the user row changes. The default backend lives in process memory; set
+REDIS_URL to share the cache (and its invalidations) between workers. Every
+method is a coroutine so the Redis backend never blocks the event loop.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+import schemas
+
+
+class InMemoryPrincipalBackend:
+    """Bounded LRU of (user_id, token key) -> (expiry, payload)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: int, token_key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((user_id, token_key))
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                self._remove((user_id, token_key))
+                return None
+            self._entries.move_to_end((user_id, token_key))
+            return payload
+
+    async def set(self, user_id: int, token_key: str, payload: str, ttl: int):
+        with self._lock:
+            key = (user_id, token_key)
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user_id, set()).add(token_key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    async def invalidate(self, user_id: int):
+        with self._lock:
+            for token_key in self._keys_by_user.pop(user_id, set()):
+                self._entries.pop((user_id, token_key), None)
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        token_keys = self._keys_by_user.get(key[0])
+        if token_keys is not None:
+            token_keys.discard(key[1])
+            if not token_keys:
+                del self._keys_by_user[key[0]]
+
+
+class RedisPrincipalBackend:
+    """One Redis hash per user (token key -> payload), so invalidation is a single DEL"""
+
+    def __init__(self, url: str, prefix: str = "principal:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, user_id: int, token_key: str) -> Optional[str]:
+        raw = await self.client.hget(f"{self.prefix}{user_id}", token_key)
+        if raw is None:
+            return None
+        expires_at, payload = json.loads(raw)
+        return payload if expires_at >= time.time() else None
+
+    async def set(self, user_id: int, token_key: str, payload: str, ttl: int):
+        key = f"{self.prefix}{user_id}"
+        async with self.client.pipeline() as pipe:
+            pipe.hset(key, token_key, json.dumps([time.time() + ttl, payload]))
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def invalidate(self, user_id: int):
+        await self.client.delete(f"{self.prefix}{user_id}")
+
+
+class PrincipalCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Raw bearer tokens never leave the request
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    async def get(self, user_id: int, token: str) -> Optional[schemas.User]:
+        if self.ttl <= 0:
+            return None
+        payload = await self.backend.get(user_id, self._token_key(token))
+        return schemas.User.model_validate_json(payload) if payload else None
+
+    async def set(self, user_id: int, token: str, user: schemas.User):
+        if self.ttl > 0:
+            await self.backend.set(user_id, self._token_key(token), user.model_dump_json(), self.ttl)
+
+    async def invalidate(self, user_id: int):
+        """Call after any change to the user's row"""
+        await self.backend.invalidate(user_id)
+
+
+def build_principal_cache() -> PrincipalCache:
+    if settings.REDIS_URL:
+        backend = RedisPrincipalBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryPrincipalBackend(settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+    return PrincipalCache(backend, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+principal_cache = build_principal_cache()
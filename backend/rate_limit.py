@@ -0,0 +1,195 @@
+"""Token-bucket rate limiting and load shedding for expensive endpoints.
+
+Each limited route names a rule from settings.RATE_LIMITS ("10/minute" means
+a bucket of 10 tokens refilled over a minute). Requests are counted against
+a per-IP bucket and, when a valid bearer token is present, a per-user bucket;
+a token is spent only when every bucket has one. A process-wide cap
+(RATE_LIMIT_MAX_CONCURRENT) bounds how many limited requests may run at
+once. Over-limit requests get 429 with Retry-After before the endpoint
+starts any work.
+
+Buckets live in process memory by default; with REDIS_URL they are kept in
+Redis so the limits hold across uvicorn workers.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from jose import jwt
+
+from config import settings
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rule(rule: str) -> Tuple[int, float]:
+    """'10/minute' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, _, period = rule.partition("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()]
+
+
+class InMemoryBucketStore:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, keys: list, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        """Take one token from every bucket, or from none when any is empty.
+
+        Returns (allowed, seconds until every bucket has a token again).
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key in keys:
+                tokens, updated = self._buckets.pop(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * refill_rate))
+            allowed = all(tokens >= 1 for tokens in levels)
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                # Least recently used buckets are the ones most likely to be full again
+                self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0.0
+        return False, max((1 - tokens) / refill_rate for tokens in levels if tokens < 1)
+
+
+class RedisBucketStore:
+    # Refill every bucket, then take from all of them or none, atomically.
+    # The wait is returned as a string so Redis keeps the fraction.
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local levels = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        levels[i] = tokens
+        if tokens < 1 then
+            wait = math.max(wait, (1 - tokens) / rate)
+        end
+    end
+    local allowed = 0
+    if wait == 0 then
+        allowed = 1
+    end
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', levels[i] - allowed, 'ts', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+    return {allowed, tostring(wait)}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    async def take(self, keys: list, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        allowed, wait = await self._script(
+            keys=[self.prefix + key for key in keys], args=[capacity, refill_rate, time.time()]
+        )
+        return bool(allowed), float(wait)
+
+
+class RateLimiter:
+    def __init__(self, store, rules: dict, max_concurrent: int, trust_forwarded: bool = False):
+        self.store = store
+        self.rules = {name: parse_rule(rule) for name, rule in rules.items()}
+        self.max_concurrent = max_concurrent
+        self.trust_forwarded = trust_forwarded
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def client_ip(self, request: Request) -> str:
+        if self.trust_forwarded:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    @staticmethod
+    def user_id(request: Request) -> Optional[str]:
+        # Signature check only, no DB: enough to pick the user's bucket
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        try:
+            return str(jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["sub"])
+        except Exception:
+            return None
+
+    def _reject(self, retry_after: float, detail: str):
+        with self._lock:
+            self.rejected += 1
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def check(self, name: str, request: Request):
+        """Count one request against the rule's IP and user buckets, spending from both or neither"""
+        if name not in self.rules:
+            return
+        capacity, refill_rate = self.rules[name]
+        keys = [f"{name}:ip:{self.client_ip(request)}"]
+        user_id = self.user_id(request)
+        if user_id:
+            keys.append(f"{name}:user:{user_id}")
+        allowed, retry_after = await self.store.take(keys, capacity, refill_rate)
+        if not allowed:
+            self._reject(retry_after, "Too many requests, please slow down")
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                saturated = True
+            else:
+                saturated = False
+                self.in_flight += 1
+        if saturated:
+            self._reject(1, "Server is busy, please try again shortly")
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def limit(self, name: str):
+        """Route dependency: rate-check, then hold a concurrency slot for the request"""
+        async def dependency(request: Request):
+            await self.check(name, request)
+            self.acquire()
+            try:
+                yield
+            finally:
+                self.release()
+        return dependency
+
+
+def build_rate_limiter() -> RateLimiter:
+    store = RedisBucketStore(settings.REDIS_URL) if settings.REDIS_URL else InMemoryBucketStore()
+    return RateLimiter(
+        store,
+        settings.RATE_LIMITS,
+        settings.RATE_LIMIT_MAX_CONCURRENT,
+        settings.RATE_LIMIT_TRUST_FORWARDED
+    )
+
+
+rate_limiter = build_rate_limiter()
@@ -0,0 +1,236 @@
+"""Route read-only requests to read replicas.
+
+With DATABASE_REPLICA_URLS set, get_read_db gives a route a session on the
+next usable replica, round-robin. If none is usable, or the chosen one
+refuses the connection, reads go to the primary.
+A replica is skipped for DATABASE_REPLICA_CHECK_SECONDS after a connection
+error. On PostgreSQL it is also skipped while its replay lag exceeds
+DATABASE_REPLICA_MAX_LAG_SECONDS. ReplicaMonitor re-probes every replica on
+that same interval.
+
+A user who has just written reads from the primary for
+DATABASE_READ_YOUR_WRITES_SECONDS, so they always see their own change.
+Routes await ``replica_router.note_write`` after committing. The marks live
+in process memory by default; set REDIS_URL to share them between workers.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from config import settings
+from database import AsyncSessionLocal, LazySessionmaker, async_url, engine_options
+from rate_limit import RateLimiter
+
+# Seconds of WAL replay behind the primary; 0 when the replica has replayed all it received
+PG_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class InMemoryWriteMarks:
+    """Bounded map of user id -> end of their read-your-writes window"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def mark(self, user_id: str, seconds: float):
+        with self._lock:
+            self._until[user_id] = time.monotonic() + seconds
+            self._until.move_to_end(user_id)
+            while len(self._until) > self.max_entries:
+                self._until.popitem(last=False)
+
+    async def recent(self, user_id: str) -> bool:
+        with self._lock:
+            until = self._until.get(user_id)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._until[user_id]
+                return False
+            return True
+
+
+class RedisWriteMarks:
+    """One expiring key per user who wrote recently"""
+
+    def __init__(self, url: str, prefix: str = "recent-write:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def mark(self, user_id: str, seconds: float):
+        await self.client.set(f"{self.prefix}{user_id}", 1, px=max(1, int(seconds * 1000)))
+
+    async def recent(self, user_id: str) -> bool:
+        return bool(await self.client.exists(f"{self.prefix}{user_id}"))
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = async_url(url)
+        self.name = make_url(self.url).render_as_string(hide_password=True)
+        self.sessionmaker = LazySessionmaker(
+            async_sessionmaker, lambda: self.engine, autoflush=False, expire_on_commit=False
+        )
+        self.skip_until = 0.0
+        self.lag = None
+        self.reads = 0
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_async_engine(self.url, **engine_options(self.url, "asyncpg"))
+        return self._engine
+
+
+class ReplicaRouter:
+    def __init__(self, urls: list, write_marks, read_your_writes_seconds: float, max_lag: float, retry_seconds: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.write_marks = write_marks
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.max_lag = max_lag
+        self.retry_seconds = retry_seconds
+        self.primary_reads = 0
+        self._turn = itertools.count()
+
+    async def note_write(self, user_id):
+        """Await after committing a user's change so their next reads see it"""
+        if self.replicas and self.read_your_writes_seconds > 0:
+            await self.write_marks.mark(str(user_id), self.read_your_writes_seconds)
+
+    async def choose(self, user_id: Optional[str]) -> Optional[Replica]:
+        """The next usable replica, or None for the primary"""
+        if self.replicas and not (user_id and await self.write_marks.recent(user_id)):
+            now = time.monotonic()
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._turn) % len(self.replicas)]
+                if replica.skip_until <= now:
+                    replica.reads += 1
+                    return replica
+        self.primary_reads += 1
+        return None
+
+    def skip(self, replica: Replica, reason: str):
+        if replica.skip_until <= time.monotonic():
+            print(f"Read replica {replica.name} skipped: {reason}")
+        replica.skip_until = time.monotonic() + self.retry_seconds
+
+    @staticmethod
+    async def _probe(replica: Replica):
+        async with replica.engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                return await conn.scalar(PG_LAG_SQL)
+            await conn.execute(text("SELECT 1"))
+            return 0
+
+    async def check(self, replica: Replica):
+        try:
+            lag = await asyncio.wait_for(self._probe(replica), timeout=self.retry_seconds)
+        except Exception as e:
+            self.skip(replica, f"{e.__class__.__name__}: {e}")
+            return
+        replica.lag = float(lag) if lag is not None else None
+        if replica.lag is not None and replica.lag > self.max_lag:
+            self.skip(replica, f"{replica.lag:.1f}s behind the primary")
+        else:
+            replica.skip_until = 0.0
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def dispose(self):
+        for replica in self.replicas:
+            if replica._engine is not None:
+                await replica._engine.dispose()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"name": r.name, "reads": r.reads, "lag": r.lag, "usable": r.skip_until <= now}
+                for r in self.replicas
+            ],
+        }
+
+
+class ReplicaMonitor:
+    """Probe every replica each interval_seconds in the background"""
+
+    def __init__(self, router: ReplicaRouter, interval_seconds: float):
+        self.router = router
+        self.interval_seconds = interval_seconds
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        while not self._stopping.is_set():
+            await self.router.check_all()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self._stopping.set()
+
+
+def build_replica_router() -> ReplicaRouter:
+    write_marks = RedisWriteMarks(settings.REDIS_URL) if settings.REDIS_URL else InMemoryWriteMarks()
+    return ReplicaRouter(
+        settings.DATABASE_REPLICA_URLS,
+        write_marks,
+        settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+        settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+        settings.DATABASE_REPLICA_CHECK_SECONDS
+    )
+
+
+replica_router = build_replica_router()
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: a replica when one is usable, otherwise the primary"""
+    # Only the token's signature is checked here; get_current_user still authenticates the request
+    user_id = RateLimiter.user_id(request) if replica_router.replicas else None
+    replica = await replica_router.choose(user_id)
+    if replica is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    async with replica.sessionmaker() as db:
+        try:
+            # Connect before handing the session out, so an unreachable replica costs a fallback, not a 500
+            await db.connection()
+        except (OperationalError, InterfaceError, OSError) as e:
+            replica_router.skip(replica, f"{e.__class__.__name__}: {e}")
+            replica.reads -= 1
+            replica = None
+        if replica is not None:
+            try:
+                yield db
+            except (OperationalError, InterfaceError, OSError) as e:
+                # Failing mid-request cannot be retried, but the next requests go elsewhere until it recovers
+                replica_router.skip(replica, f"{e.__class__.__name__}: {e}")
+                raise
+            return
+
+    replica_router.primary_reads += 1
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,16 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson.
+
+    For read-heavy endpoints that build plain dicts themselves: returning
+    this response skips response_model validation, so the content must
+    already match the declared schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
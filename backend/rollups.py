@@ -0,0 +1,184 @@
+"""Maintain the user_daily_stats rollup table.
+
+Session writes call ``add_session``/``remove_session`` inside their own
+transaction so the rollups never drift from study_sessions. Running this
+module rebuilds rollups from the raw sessions:
+
+    python rollups.py --user-id 42        # rebuild one user
+    python rollups.py --all --check       # only report users whose rollups drifted
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(models.UserDailyStats)
+
+
+def apply_delta(
+    db: Session,
+    user_id: int,
+    day: date,
+    minutes: int,
+    count: int,
+    quality: int,
+    completion: int
+):
+    """Add the given amounts to one (user, day) rollup row, creating it if needed"""
+    table = models.UserDailyStats
+    stmt = _upsert(db)
+
+    if stmt is not None:
+        stmt = stmt.values(
+            user_id=user_id,
+            day=day,
+            total_minutes=minutes,
+            session_count=count,
+            quality_sum=quality,
+            completion_sum=completion
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.user_id, table.day],
+            set_={
+                "total_minutes": table.total_minutes + minutes,
+                "session_count": table.session_count + count,
+                "quality_sum": table.quality_sum + quality,
+                "completion_sum": table.completion_sum + completion,
+            }
+        ))
+    else:
+        row = db.query(table).filter(
+            table.user_id == user_id,
+            table.day == day
+        ).with_for_update().first()
+        if not row:
+            row = table(user_id=user_id, day=day, total_minutes=0, session_count=0,
+                        quality_sum=0, completion_sum=0)
+            db.add(row)
+        row.total_minutes += minutes
+        row.session_count += count
+        row.quality_sum += quality
+        row.completion_sum += completion
+        db.flush()
+
+    if count < 0:
+        # Drop days that no longer have any sessions
+        db.execute(delete(table).where(
+            table.user_id == user_id,
+            table.day == day,
+            table.session_count <= 0
+        ))
+
+
+def _apply_session(db: Session, session: models.StudySession, sign: int):
+    apply_delta(
+        db,
+        session.user_id,
+        session.study_date,
+        sign * (session.duration_minutes or 0),
+        sign,
+        sign * (session.quality or 0),
+        sign * (session.percentage_completion or 0)
+    )
+
+
+def add_session(db: Session, session: models.StudySession):
+    """Count a new or updated session in its day's rollup"""
+    _apply_session(db, session, 1)
+
+
+def remove_session(db: Session, session: models.StudySession):
+    """Take a deleted session (or the old state of an updated one) out of its rollup"""
+    _apply_session(db, session, -1)
+
+
+def add_session_rows(db: Session, user_id: int, rows: list):
+    """Count a batch of freshly inserted session rows (plain dicts), one upsert per day"""
+    days = {}
+    for row in rows:
+        totals = days.setdefault(row["study_date"], [0, 0, 0, 0])
+        totals[0] += row["duration_minutes"] or 0
+        totals[1] += 1
+        totals[2] += row["quality"] or 0
+        totals[3] += row["percentage_completion"] or 0
+    for day, (minutes, count, quality, completion) in days.items():
+        apply_delta(db, user_id, day, minutes, count, quality, completion)
+
+
+def _raw_daily_totals(user_id: int):
+    sessions = models.StudySession
+    return select(
+        sessions.user_id,
+        sessions.study_date,
+        func.coalesce(func.sum(sessions.duration_minutes), 0),
+        func.count(sessions.id),
+        func.coalesce(func.sum(sessions.quality), 0),
+        func.coalesce(func.sum(sessions.percentage_completion), 0)
+    ).where(
+        sessions.user_id == user_id
+    ).group_by(sessions.user_id, sessions.study_date)
+
+
+def rebuild_user(db: Session, user_id: int):
+    """Recompute every rollup row of a user from study_sessions"""
+    table = models.UserDailyStats
+    db.execute(delete(table).where(table.user_id == user_id))
+    db.execute(insert(table).from_select(
+        ["user_id", "day", "total_minutes", "session_count", "quality_sum", "completion_sum"],
+        _raw_daily_totals(user_id)
+    ))
+
+
+def find_drift(db: Session, user_id: int) -> list:
+    """Return the days whose stored rollup differs from the raw sessions"""
+    table = models.UserDailyStats
+    expected = {
+        str(row[1]): tuple(row[2:])
+        for row in db.execute(_raw_daily_totals(user_id))
+    }
+    stored = {
+        str(row.day): (row.total_minutes, row.session_count, row.quality_sum, row.completion_sum)
+        for row in db.query(table).filter(table.user_id == user_id)
+    }
+    return sorted(day for day in expected.keys() | stored.keys() if expected.get(day) != stored.get(day))
+
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild user_daily_stats from study_sessions")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="user to rebuild (repeatable)")
+    target.add_argument("--all", action="store_true", help="rebuild every user")
+    parser.add_argument("--check", action="store_true", help="only report drifted users, do not write")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_ids = args.user_id or [row.id for row in db.query(models.User.id).order_by(models.User.id)]
+        for user_id in user_ids:
+            drift = find_drift(db, user_id)
+            if not drift:
+                continue
+            print(f"user {user_id}: {len(drift)} day(s) out of sync ({drift[0]} .. {drift[-1]})")
+            if not args.check:
+                rebuild_user(db, user_id)
+                db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
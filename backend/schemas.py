@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Literal, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -19,6 +19,24 @@ class SessionCreate(BaseModel):
     percentage_completion: Optional[int] = None
     notes: Optional[str] = None  
 
+class SessionInput(BaseModel):
+    # Session fields without the owner, which always comes from the token
+    subject: str
+    start_time: datetime
+    end_time: datetime
+    quality: Optional[int] = None
+    percentage_completion: Optional[int] = None
+    notes: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    row: int  # line number in the uploaded file
+    error: str
+
+class SessionImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
 class User(BaseModel):
     id: int
     username: str
@@ -36,6 +54,7 @@ class StudySession(BaseModel):
     subject: str  
     start_time: datetime
     end_time: datetime
+    duration_minutes: Optional[int] = None
     quality: Optional[int] = None
     percentage_completion: Optional[int] = None
     notes: Optional[str] = None 
@@ -43,6 +62,28 @@ class StudySession(BaseModel):
     class Config:
         from_attributes = True
 
+class SessionPage(BaseModel):
+    items: List[StudySession]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= to fetch the next page
+
+class SessionBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None  # required for update/delete
+    data: Optional[SessionInput] = None  # required for create/update
+
+class SessionBatchRequest(BaseModel):
+    operations: List[SessionBatchOperation] = Field(min_length=1, max_length=500)
+
+class SessionBatchResult(BaseModel):
+    op: str
+    id: Optional[int] = None
+    status: int
+    session: Optional[StudySession] = None
+    error: Optional[str] = None
+
+class SessionBatchResponse(BaseModel):
+    results: List[SessionBatchResult]
+
 class UserLogin(BaseModel):
     email: str
     password: str
@@ -71,6 +112,7 @@ class LoginResponse(BaseModel):
 
 class ChatMessage(BaseModel):
     message: str
+    personalized: bool = False  # skip the shared reply cache
 
 class ChatResponse(BaseModel):
     reply: str
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""Compact per-user study snapshots for grounding chatbot replies.
+
+A snapshot is a few lines of text (this week vs last week, the last 28
+days, current streak, top subjects) built from user_daily_stats plus one
+small grouped query over the user's recent sessions. It is built once and
+then served from memory until the user's sessions change (the session
+routes call ``invalidate``), the day rolls over, or
+CHAT_SNAPSHOT_MAX_AGE_SECONDS passes, which bounds staleness when several
+workers each hold their own copy.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config import settings
+import models
+
+WINDOW_DAYS = 28
+MAX_STREAK_DAYS = 366
+TOP_SUBJECTS = 3
+SUBJECT_CHARS = 40
+
+
+@dataclass
+class StudySnapshot:
+    built_on: date
+    built_at: float
+    text: str
+
+
+def _hours(minutes: int) -> str:
+    return f"{minutes / 60:.1f} h"
+
+
+def _period(rows: list, start: date, end: date) -> str:
+    minutes = sessions = quality = 0
+    for day, day_minutes, day_sessions, day_quality in rows:
+        if start <= day < end:
+            minutes += day_minutes
+            sessions += day_sessions
+            quality += day_quality
+    if not sessions:
+        return "no sessions"
+    return f"{_hours(minutes)} over {sessions} session(s), avg quality {quality / sessions:.1f}/5"
+
+
+def build_snapshot_text(db: Session, user_id: int, today: date) -> str:
+    stats = models.UserDailyStats
+    window_start = today - timedelta(days=WINDOW_DAYS - 1)
+    week_start = today - timedelta(days=today.weekday())
+    last_week_start = week_start - timedelta(days=7)
+    first_day = min(window_start, last_week_start)
+
+    rows = db.query(
+        stats.day, stats.total_minutes, stats.session_count, stats.quality_sum
+    ).filter(
+        stats.user_id == user_id,
+        stats.day >= first_day,
+        stats.day <= today
+    ).all()
+    if not rows:
+        return "Student's study data: no study sessions recorded in the last four weeks."
+
+    # Walk back from today (or yesterday, if nothing is logged yet today) over the rollup's primary key
+    active_days = db.query(stats.day).filter(
+        stats.user_id == user_id,
+        stats.day <= today
+    ).order_by(stats.day.desc()).limit(MAX_STREAK_DAYS).all()
+    streak = 0
+    expected = today if active_days[0][0] == today else today - timedelta(days=1)
+    for (day,) in active_days:
+        if day != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+
+    sessions = models.StudySession
+    subjects = db.query(
+        sessions.subject, func.coalesce(func.sum(sessions.duration_minutes), 0)
+    ).filter(
+        sessions.user_id == user_id,
+        sessions.study_date >= window_start,
+        sessions.study_date <= today
+    ).group_by(sessions.subject).order_by(
+        func.sum(sessions.duration_minutes).desc()
+    ).limit(TOP_SUBJECTS).all()
+
+    window = [row for row in rows if row[0] >= window_start]
+    lines = [
+        f"Student's study data as of {today:%A %b %d}:",
+        f"- This week (since Monday): {_period(rows, week_start, today + timedelta(days=1))}",
+        f"- Last week: {_period(rows, last_week_start, week_start)}",
+        f"- Last {WINDOW_DAYS} days: {_hours(sum(r[1] for r in window))}, "
+        f"{sum(r[2] for r in window)} session(s) on {len(window)} day(s)",
+        f"- Current streak: {streak} day(s)",
+    ]
+    if subjects:
+        lines.append("- Top subjects: " + ", ".join(
+            f"{(subject or 'Unspecified')[:SUBJECT_CHARS]} {_hours(minutes)}" for subject, minutes in subjects
+        ))
+    return "\n".join(lines)[:settings.CHAT_SNAPSHOT_MAX_CHARS]
+
+
+class SnapshotCache:
+    """Bounded LRU of user_id -> StudySnapshot"""
+
+    def __init__(self, max_entries: int, max_age: int):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.builds = 0
+        self._entries = OrderedDict()
+        self._building = {}  # user_id -> invalidated while the build was running
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        with self._lock:
+            snapshot = self._entries.get(user_id)
+            if snapshot is None:
+                return None
+            if snapshot.built_on != date.today() or time.monotonic() - snapshot.built_at > self.max_age:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def get_or_build(self, session_factory, user_id: int) -> StudySnapshot:
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            return snapshot
+        today = date.today()
+        with self._lock:
+            self._building[user_id] = False
+        db = session_factory()
+        try:
+            snapshot = StudySnapshot(today, time.monotonic(), build_snapshot_text(db, user_id, today))
+        finally:
+            db.close()
+        with self._lock:
+            self.builds += 1
+            if self._building.pop(user_id, True):
+                # Sessions changed mid-build: use it for this message but do not keep it
+                return snapshot
+            self._entries[user_id] = snapshot
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: int):
+        """Call after the user's sessions change"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if user_id in self._building:
+                self._building[user_id] = True
+
+
+snapshot_cache = SnapshotCache(settings.CHAT_SNAPSHOT_MAX_ENTRIES, settings.CHAT_SNAPSHOT_MAX_AGE_SECONDS)
@@ -0,0 +1,21 @@
+"""Make the flat ``backend`` modules importable from benchmark scripts.
+
+The backend imports its siblings as top-level modules (``import models``) and
+builds ``config.settings`` at import time, so scripts need ``backend`` on the
+path and placeholder values for settings they do not exercise.
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("BREVO_API_KEY", "bench")
+os.environ.setdefault("FROM_EMAIL", "bench@example.com")
+os.environ.setdefault("FROM_NAME", "bench")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
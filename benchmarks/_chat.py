@@ -0,0 +1,41 @@
+"""Shared setup for the chatbot WebSocket benchmarks.
+
+The socket authenticates in a thread, so the in-process server needs a file
+database rather than sqlite's per-thread in-memory one. Import this instead
+of ``_bootstrap``.
+"""
+import json
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'focusflow_chat_bench.db')}")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "0")
+os.environ.setdefault("TOKEN_SWEEPER", "0")
+
+import _bootstrap  # noqa: F401,E402
+
+
+def bench_token() -> str:
+    """Access token for a benchmark user, created on first use"""
+    import models
+    from api.routers.auth import create_access_token
+    from database import Base, SessionLocal, get_engine
+
+    Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == "chat-bench@example.com").first()
+        if user is None:
+            user = models.User(username="chat-bench", email="chat-bench@example.com", password="", is_verified=True)
+            db.add(user)
+            db.commit()
+        return create_access_token({"sub": str(user.id)})
+    finally:
+        db.close()
+
+
+async def authenticate(ws, token: str):
+    await ws.send(json.dumps({"type": "auth", "token": token}))
+    frame = json.loads(await ws.recv())
+    if frame.get("type") != "ready":
+        raise RuntimeError(f"chat authentication failed: {frame}")
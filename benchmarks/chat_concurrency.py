@@ -0,0 +1,98 @@
+"""Check that concurrent chatbot WebSocket replies stream interleaved.
+
+Usage (from the repository root):
+
+    python benchmarks/chat_concurrency.py --connections 50
+    python benchmarks/chat_concurrency.py --connections 50 --blocking   # old behaviour
+
+Runs the app under uvicorn on the same event loop as N WebSocket clients and
+swaps Gemini for llm_providers.FakeProvider, streaming --chunks chunks
+--delay-ms apart. With the async client every connection gets its first
+chunk before any reply completes and the wall time stays close to one reply.
+--blocking makes the fake sleep synchronously, like the old
+generate_content_stream loop, which serializes the connections.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from _chat import authenticate, bench_token
+
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+from config import settings  # noqa: E402
+from main import app  # noqa: E402
+from api.routers import chatbot  # noqa: E402
+from llm_providers import FakeProvider  # noqa: E402
+
+
+class BlockingFakeProvider(FakeProvider):
+    """Sleeps synchronously between chunks, like iterating the old blocking SDK stream"""
+
+    async def stream(self, turns, system_instruction=None, usage=None):
+        time.sleep(self.first_chunk_ms / 1000)
+        for i, text in enumerate(self.reply_words(turns[-1].text)[::self.chunk_size]):
+            if i:
+                time.sleep(self.chunk_ms / 1000)
+            yield text + " "
+
+
+async def chat(url: str, token: str, started: float) -> tuple:
+    async with websockets.connect(url) as ws:
+        await authenticate(ws, token)
+        await ws.send(json.dumps({"message": "How does Pomodoro work?"}))
+        first_chunk = None
+        while True:
+            frame = json.loads(await ws.recv())
+            if frame["type"] == "chunk" and first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            if frame["type"] in ("complete", "error"):
+                return first_chunk, time.perf_counter() - started, frame["type"]
+
+
+async def run(args):
+    fake = BlockingFakeProvider if args.blocking else FakeProvider
+    chatbot.provider = fake(first_chunk_ms=args.delay_ms, chunk_ms=args.delay_ms, chunk_size=1, chunks=args.chunks)
+    settings.CHAT_QUEUE_TIMEOUT_SECONDS = 600
+    chatbot.generation_slots = asyncio.Semaphore(args.connections)
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", lifespan="off"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"ws://127.0.0.1:{args.port}/api/chatbot/ws"
+    token = bench_token()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(chat(url, token, started) for _ in range(args.connections)))
+    wall = time.perf_counter() - started
+
+    server.should_exit = True
+    await serving
+
+    firsts = sorted(r[0] for r in results)
+    completes = sorted(r[1] for r in results)
+    one_reply = args.chunks * args.delay_ms / 1000
+    print(f"connections: {args.connections}, reply: {args.chunks} chunks x {args.delay_ms:.0f} ms "
+          f"({one_reply:.2f} s), provider: {'blocking' if args.blocking else 'async'}")
+    print(f"wall time:          {wall:.2f} s")
+    print(f"first chunk:        min {firsts[0]:.2f} s  max {firsts[-1]:.2f} s")
+    print(f"complete:           min {completes[0]:.2f} s  max {completes[-1]:.2f} s")
+    print(f"interleaved:        {firsts[-1] < completes[0]}")
+    print(f"errors:             {sum(r[2] == 'error' for r in results)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=25.0)
+    parser.add_argument("--blocking", action="store_true", help="fake a synchronous provider")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare per-turn prompt sizes with and without server-side conversation memory.
+
+Usage (from the repository root):
+
+    python benchmarks/chat_prompt_tokens.py --turns 30
+    python benchmarks/chat_prompt_tokens.py --turns 30 --budget 1000
+
+Before conversation memory, clients that wanted follow-up answers pasted the
+earlier turns into each message, and the server glued the system prompt onto
+that. With memory the server sends the system instruction plus history
+trimmed to CHAT_HISTORY_TOKEN_BUDGET. Both are estimated with the same local
+token counter the chatbot reports in its "complete" frames.
+"""
+import argparse
+
+import _bootstrap  # noqa: F401
+
+from api.routers.chatbot import context  # noqa: E402
+from chat_memory import Conversation, estimate_tokens  # noqa: E402
+from config import settings  # noqa: E402
+from llm_providers import FakeProvider, estimate_prompt_tokens  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=settings.CHAT_HISTORY_TOKEN_BUDGET)
+    parser.add_argument("--summary-budget", type=int, default=settings.CHAT_SUMMARY_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    fake = FakeProvider(chunks=40, chunk_size=4)
+    conversation = Conversation(args.budget, args.summary_budget)
+    pasted = ""
+    old_total = new_total = 0
+
+    print(f"{'turn':>4} {'pasted (old)':>13} {'memory (new)':>13} {'history':>8} {'dropped':>8}")
+    for turn in range(1, args.turns + 1):
+        question = f"Question {turn}: how should I plan revision for topic {turn} before my exams?"
+        reply = " ".join(fake.reply_words(question))
+
+        old = estimate_tokens(f"{context}\n\nUser message: {pasted}{question}")
+        turns, dropped = conversation.prompt_turns(question)
+        new = estimate_prompt_tokens(turns, context)
+        conversation.record(question, reply)
+        pasted += f"Me: {question}\nAssistant: {reply}\n"
+
+        old_total += old
+        new_total += new
+        print(f"{turn:>4} {old:>13} {new:>13} {len(turns) - 1:>8} {dropped:>8}")
+
+    print(f"total prompt tokens over {args.turns} turns: {old_total} pasted vs {new_total} with memory "
+          f"({100 * (1 - new_total / old_total):.0f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
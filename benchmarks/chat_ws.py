@@ -0,0 +1,129 @@
+"""Measure /api/chatbot/ws latency, throughput and connection capacity.
+
+Usage (from the repository root):
+
+    python benchmarks/chat_ws.py --levels 10 50 100 200
+    python benchmarks/chat_ws.py --url ws://localhost:8000/api/chatbot/ws --token <access token>
+
+Without --url the app runs in-process under uvicorn with CHAT_PROVIDER=fake,
+so no paid API is called; the fake's latency, chunk size and error rate come
+from the FAKE_LLM_* settings. For an external server, start it with
+CHAT_PROVIDER=fake as well and pass a user's access token with --token.
+
+For each concurrency level every connection sends --messages messages one
+after another. Messages are marked personalized so every reply goes to the
+provider; --cacheable lets them hit the reply cache instead. Reported per
+level: time to first chunk (p50/p95), aggregate chunks per second, errors,
+and whether the level met --ttfc-slo-ms; the capacity is the highest level
+that met it with no errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("CHAT_PROVIDER", "fake")
+
+from _chat import authenticate, bench_token  # noqa: E402
+
+import websockets  # noqa: E402
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def converse(url: str, token: str, messages: int, cacheable: bool, ttfc: list, counts: dict):
+    async with websockets.connect(url, max_size=None) as ws:
+        await authenticate(ws, token)
+        for i in range(messages):
+            sent = time.perf_counter()
+            await ws.send(json.dumps({"message": f"Study tip number {i}?", "personalized": not cacheable}))
+            first = True
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] == "chunk":
+                    if first:
+                        ttfc.append(time.perf_counter() - sent)
+                        first = False
+                    counts["chunks"] += 1
+                elif frame["type"] == "complete":
+                    counts["replies"] += 1
+                    break
+                else:
+                    counts["errors"] += 1
+                    break
+
+
+async def run_level(url: str, token: str, connections: int, messages: int, cacheable: bool) -> dict:
+    ttfc = []
+    counts = {"chunks": 0, "replies": 0, "errors": 0}
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(converse(url, token, messages, cacheable, ttfc, counts) for _ in range(connections)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    counts["errors"] += sum(isinstance(outcome, Exception) for outcome in outcomes)
+    return {
+        "connections": connections,
+        "p50": statistics.median(ttfc) * 1000 if ttfc else float("nan"),
+        "p95": percentile(ttfc, 0.95) * 1000 if ttfc else float("nan"),
+        "chunks_per_s": counts["chunks"] / elapsed,
+        "replies": counts["replies"],
+        "errors": counts["errors"],
+        "elapsed": elapsed,
+    }
+
+
+async def run(args):
+    server = serving = None
+    url = args.url
+    token = args.token
+    if not url:
+        import uvicorn
+        from main import app
+
+        server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", lifespan="off"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        url = f"ws://127.0.0.1:{args.port}/api/chatbot/ws"
+        token = bench_token()
+
+    print(f"{'conns':>6} {'ttfc p50':>9} {'ttfc p95':>9} {'chunks/s':>9} {'replies':>8} {'errors':>7} {'slo':>4}")
+    capacity = 0
+    for level in args.levels:
+        result = await run_level(url, token, level, args.messages, args.cacheable)
+        met = result["errors"] == 0 and result["p95"] <= args.ttfc_slo_ms
+        if met:
+            capacity = level
+        print(f"{level:>6} {result['p50']:>7.0f}ms {result['p95']:>7.0f}ms {result['chunks_per_s']:>9.0f} "
+              f"{result['replies']:>8} {result['errors']:>7} {'ok' if met else 'miss':>4}")
+    print(f"capacity: {capacity} concurrent connections within a {args.ttfc_slo_ms:.0f} ms p95 time to first chunk")
+
+    if server:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--messages", type=int, default=3, help="messages per connection")
+    parser.add_argument("--cacheable", action="store_true", help="let repeated messages hit the reply cache")
+    parser.add_argument("--ttfc-slo-ms", type=float, default=1000.0)
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--token", help="access token for --url")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    if args.url and not args.token:
+        parser.error("--url needs --token")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
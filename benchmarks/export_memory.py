@@ -0,0 +1,83 @@
+"""Check that streaming session exports run in constant memory.
+
+Usage (from the repository root):
+
+    python benchmarks/export_memory.py --rows 1000000 --max-mb 64
+
+Seeds one user with N synthetic sessions in a scratch SQLite file, drains
+the export generator behind GET /api/sessions/export and reports the peak
+Python heap allocation. Exits non-zero if the peak exceeds --max-mb.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_scratch = os.path.join(tempfile.mkdtemp(prefix="focusflow-export-"), "export.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}")
+
+import _bootstrap  # noqa: F401,E402
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from database import Base  # noqa: E402
+import models  # noqa: E402
+from api.routers.sessions import iter_export  # noqa: E402
+
+
+def seed(url: str, rows: int, batch: int = 50_000):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2015, 1, 1, 8, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": 1, "username": "bench", "email": "bench@example.com"}])
+        for offset in range(0, rows, batch):
+            conn.execute(insert(models.StudySession), [
+                {
+                    "user_id": 1,
+                    "subject": "Math",
+                    "start_time": start + timedelta(minutes=30 * i),
+                    "end_time": start + timedelta(minutes=30 * i + 25),
+                    "study_date": (start + timedelta(minutes=30 * i)).date(),
+                    "duration_minutes": 25,
+                    "quality": i % 5 + 1,
+                    "percentage_completion": i % 101,
+                    "notes": "synthetic",
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--max-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    url = os.environ["DATABASE_URL"]
+    seed(url, args.rows)
+
+    tracemalloc.start()
+    began = time.perf_counter()
+    total_bytes = 0
+    for chunk in iter_export(1, args.format, args.gzip, {}):
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_mb = peak / 1024 / 1024
+    print(f"rows={args.rows} format={args.format} gzip={args.gzip} "
+          f"bytes={total_bytes} seconds={elapsed:.1f} peak_heap_mb={peak_mb:.1f}")
+    if peak_mb > args.max_mb:
+        print(f"FAIL: peak {peak_mb:.1f} MB exceeds ceiling of {args.max_mb} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
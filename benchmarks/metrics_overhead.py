@@ -0,0 +1,87 @@
+"""Measure what request and SQL instrumentation costs, and show per-route query counts.
+
+Usage (from the repository root):
+
+    python benchmarks/metrics_overhead.py --requests 2000
+
+Serves the session list, dashboard and profile routes in-process, first
+from an app built with METRICS_ENABLED off, then with it on (plus the
+Server-Timing header). It prints the mean latency of each, then the mean
+queries per request for each route, read back from /metrics. That is the
+number to watch for N+1 regressions.
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'metrics.db')}")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "0")
+os.environ.setdefault("TOKEN_SWEEPER", "0")
+os.environ["METRICS_ENABLED"] = "0"  # main's module-level app must not install the SQL hooks yet
+
+import _bootstrap  # noqa: F401,E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from config import settings  # noqa: E402
+from database import Base, SessionLocal, get_engine  # noqa: E402
+import models  # noqa: E402
+from api.routers.auth import create_access_token  # noqa: E402
+
+ROUTES = ["/api/sessions/?limit=20", "/api/stats/dashboard", "/api/profile/me"]
+QUERY_SUMS = re.compile(r'http_request_db_queries_(sum|count)\{method="GET",route="([^"]+)"\} (\S+)')
+
+
+def seed() -> str:
+    Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        user = models.User(username="metrics-bench", email=f"metrics-{time.time_ns()}@example.com", password="")
+        db.add(user)
+        db.commit()
+        return create_access_token({"sub": str(user.id)})
+    finally:
+        db.close()
+
+
+def run(app, headers: dict, requests: int) -> float:
+    with TestClient(app) as client:
+        for route in ROUTES:
+            client.get(route, headers=headers)
+        started = time.perf_counter()
+        for i in range(requests):
+            assert client.get(ROUTES[i % len(ROUTES)], headers=headers).status_code == 200
+        return (time.perf_counter() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    from main import create_app
+
+    headers = {"Authorization": f"Bearer {seed()}"}
+    plain = run(create_app(), headers, args.requests)
+    settings.METRICS_ENABLED = True
+    settings.METRICS_TOKEN = None
+    settings.SERVER_TIMING_HEADER = True
+    app = create_app()
+    instrumented = run(app, headers, args.requests)
+    print(f"without metrics: {plain:.3f} ms/request")
+    print(f"with metrics:    {instrumented:.3f} ms/request ({instrumented - plain:+.3f} ms)")
+
+    with TestClient(app) as client:
+        exposition = client.get("/metrics").text
+    totals = {}
+    for kind, route, value in QUERY_SUMS.findall(exposition):
+        totals.setdefault(route, {})[kind] = float(value)
+    print("queries per request:")
+    for route, sums in sorted(totals.items()):
+        print(f"  {route:<28} {sums['sum'] / sums['count']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Check read-replica routing: round-robin, read-your-writes and fallback.
+
+Usage (from the repository root):
+
+    python benchmarks/replica_routing.py
+    DATABASE_URL=postgresql://localhost:5432/focusflow \\
+    DATABASE_REPLICA_URLS='["postgresql://localhost:5433/focusflow"]' \\
+        python benchmarks/replica_routing.py --reads 200
+
+Without DATABASE_URL the primary is a temporary SQLite file. Two copies of
+it, taken after seeding, act as replicas frozen at that point, so any read
+that reaches them cannot see later writes. A third replica URL points at a
+path that cannot be opened. The monitor should skip that one.
+
+The script runs --reads list requests for two users and reports where they
+went. User A then creates a session and lists again; that read should go to
+the primary and include the new session. User B keeps reading from the
+replicas. Once DATABASE_READ_YOUR_WRITES_SECONDS has passed, user A is back
+on the replicas.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+_scratch = None
+if "DATABASE_URL" not in os.environ:
+    _scratch = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'primary.db')}"
+    os.environ["DATABASE_REPLICA_URLS"] = json.dumps([
+        f"sqlite:///{os.path.join(_scratch, 'replica1.db')}",
+        f"sqlite:///{os.path.join(_scratch, 'replica2.db')}",
+        f"sqlite:///{os.path.join(_scratch, 'missing', 'replica3.db')}",
+    ])
+os.environ.setdefault("DATABASE_READ_YOUR_WRITES_SECONDS", "1")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "0")
+os.environ.setdefault("TOKEN_SWEEPER", "0")
+
+import _bootstrap  # noqa: F401,E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from config import settings  # noqa: E402
+from database import Base, SessionLocal, get_engine  # noqa: E402
+import models  # noqa: E402
+from api.routers.auth import create_access_token  # noqa: E402
+
+
+def seed() -> list:
+    Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        tokens = []
+        for name in ("replica-a", "replica-b"):
+            user = models.User(username=f"{name}-{time.time_ns()}", email=f"{name}-{time.time_ns()}@example.com", password="")
+            db.add(user)
+            db.flush()
+            tokens.append(create_access_token({"sub": str(user.id)}))
+        db.commit()
+        return tokens
+    finally:
+        db.close()
+
+
+def copy_replicas():
+    primary = settings.DATABASE_URL.split("///", 1)[1]
+    for url in settings.DATABASE_REPLICA_URLS:
+        path = url.split("///", 1)[1]
+        if os.path.isdir(os.path.dirname(path)):
+            # sqlite3's backup API copies a consistent snapshot
+            with sqlite3.connect(primary) as source, sqlite3.connect(path) as target:
+                source.backup(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=40, help="list requests per user")
+    args = parser.parse_args()
+
+    tokens = seed()
+    if _scratch:
+        copy_replicas()
+
+    from main import app
+    from replicas import replica_router
+
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    with TestClient(app) as client:
+        replica_router.primary_reads = 0
+        for _ in range(args.reads):
+            for user_headers in headers:
+                assert client.get("/api/sessions/", headers=user_headers).status_code == 200
+        print(json.dumps(replica_router.stats(), indent=2))
+
+        created = client.post("/api/sessions/", headers=headers[0], json={
+            "user_id": 0,
+            "subject": "Replica check",
+            "start_time": "2026-01-05T09:00:00",
+            "end_time": "2026-01-05T10:00:00",
+        }).json()["id"]
+
+        def sees_new_session() -> bool:
+            items = client.get("/api/sessions/", headers=headers[0]).json()["items"]
+            return any(item["id"] == created for item in items)
+
+        before = replica_router.primary_reads
+        print(f"user A right after writing sees the new session: {sees_new_session()}")
+        print(f"  read served by the primary: {replica_router.primary_reads > before}")
+        before = replica_router.primary_reads
+        client.get("/api/sessions/", headers=headers[1])
+        print(f"user B meanwhile reads from a replica: {replica_router.primary_reads == before}")
+
+        time.sleep(settings.DATABASE_READ_YOUR_WRITES_SECONDS + 0.1)
+        before = replica_router.primary_reads
+        visible = sees_new_session()
+        print(f"user A after {settings.DATABASE_READ_YOUR_WRITES_SECONDS:g}s reads from a replica: "
+              f"{replica_router.primary_reads == before}"
+              + (" (frozen copy, so the session is not there)" if _scratch and not visible else ""))
+
+    if _scratch:
+        shutil.rmtree(_scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-row cost of the session list serialization paths.
+
+Usage (from the repository root):
+
+    python benchmarks/serialization.py --rows 100 1000 10000
+
+"orm+pydantic" hydrates StudySession objects, validates them through
+schemas.SessionPage and encodes with the stdlib json module (the path
+FastAPI takes for a response_model). "tuples+orjson" is the fast path in
+GET /api/sessions/: selected columns, dicts built directly, orjson.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import _bootstrap  # noqa: F401
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+import models, schemas  # noqa: E402
+from api.routers.sessions import LIST_COLUMNS, LIST_FIELDS  # noqa: E402
+from responses import FastJSONResponse  # noqa: E402
+
+
+def orm_pydantic(db, limit: int) -> bytes:
+    rows = db.query(models.StudySession).filter(
+        models.StudySession.user_id == 1
+    ).order_by(models.StudySession.start_time.desc()).limit(limit).all()
+    page = schemas.SessionPage(items=[schemas.StudySession.model_validate(row) for row in rows])
+    return json.dumps(jsonable_encoder(page)).encode()
+
+
+def tuples_orjson(db, limit: int) -> bytes:
+    rows = db.query(*LIST_COLUMNS).filter(
+        models.StudySession.user_id == 1
+    ).order_by(models.StudySession.start_time.desc()).limit(limit).all()
+    return FastJSONResponse({"items": [dict(zip(LIST_FIELDS, row)) for row in rows], "next_cursor": None}).body
+
+
+def per_row_us(fn, db, rows: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        db.expunge_all()
+        began = time.perf_counter()
+        fn(db, rows)
+        samples.append(time.perf_counter() - began)
+    return statistics.median(samples) / rows * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2022, 1, 1, 9, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": 1, "username": "bench", "email": "bench@example.com"}])
+        conn.execute(insert(models.StudySession), [
+            {
+                "user_id": 1, "subject": "Math",
+                "start_time": start + timedelta(hours=i), "end_time": start + timedelta(hours=i, minutes=50),
+                "study_date": (start + timedelta(hours=i)).date(), "duration_minutes": 50,
+                "quality": i % 5 + 1, "percentage_completion": i % 101, "notes": "synthetic session",
+            }
+            for i in range(max(args.rows))
+        ])
+    db = sessionmaker(bind=engine)()
+
+    assert json.loads(orm_pydantic(db, 10)) == json.loads(tuples_orjson(db, 10))
+    print(f"{'rows':>7} {'orm+pydantic (us/row)':>22} {'tuples+orjson (us/row)':>23} {'speedup':>8}")
+    for rows in args.rows:
+        old = per_row_us(orm_pydantic, db, rows, args.repeat)
+        new = per_row_us(tuples_orjson, db, rows, args.repeat)
+        print(f"{rows:>7} {old:>22.2f} {new:>23.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
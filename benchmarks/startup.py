@@ -0,0 +1,111 @@
+"""Time a cold start: importing the app, building it, the lifespan, and the first request.
+
+Usage (from the repository root):
+
+    python benchmarks/startup.py --repeats 7
+
+Each repeat runs in a fresh interpreter so nothing is cached in sys.modules.
+The child times ``import main``, ``create_app()``, the lifespan startup, the
+first authenticated GET /api/profile/me and the lifespan shutdown, and lists
+which heavy optional modules (the Gemini and Brevo SDKs, the Redis client)
+were loaded along the way. None should be before the first chat message or
+email. The parent prints the median of each phase.
+
+Without DATABASE_URL a temporary SQLite file is used; its tables are created
+up front, the way ``alembic upgrade head`` would in a deployment.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ["import", "create_app", "startup", "first_request", "shutdown"]
+HEAVY_MODULES = ["google.genai", "sib_api_v3_sdk", "redis"]
+
+
+def child():
+    import _bootstrap  # noqa: F401
+    from fastapi.testclient import TestClient
+
+    started = time.perf_counter()
+    timings = {}
+
+    def lap(phase):
+        nonlocal started
+        now = time.perf_counter()
+        timings[phase] = (now - started) * 1000
+        started = now
+
+    import main
+    lap("import")
+    app = main.create_app()
+    lap("create_app")
+    with TestClient(app) as client:
+        lap("startup")
+        response = client.get("/api/profile/me", headers={"Authorization": f"Bearer {os.environ['STARTUP_TOKEN']}"})
+        lap("first_request")
+    lap("shutdown")
+
+    print(json.dumps({
+        "timings": timings,
+        "status": response.status_code,
+        "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def seed() -> str:
+    import _bootstrap  # noqa: F401
+
+    import models
+    from api.routers.auth import create_access_token
+    from database import Base, SessionLocal, get_engine
+
+    Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        user = models.User(username="startup-bench", email="startup-bench@example.com", password="", is_verified=True)
+        db.add(user)
+        db.commit()
+        return create_access_token({"sub": str(user.id)})
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'startup.db')}")
+    os.environ.setdefault("EMAIL_TRANSPORT", "file")
+    os.environ.setdefault("EMAIL_FILE_DIR", os.path.join(scratch, "sent_emails"))
+    if args.child:
+        child()
+        return
+    os.environ["STARTUP_TOKEN"] = seed()
+
+    runs = []
+    for _ in range(args.repeats):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            capture_output=True, text=True, check=True, env=os.environ
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.repeats} cold starts, database: {os.environ['DATABASE_URL'].split(':', 1)[0]}")
+    for phase in PHASES:
+        print(f"{phase:>14} {statistics.median(run['timings'][phase] for run in runs):>8.1f}ms")
+    total = statistics.median(sum(run["timings"].values()) - run["timings"]["shutdown"] for run in runs)
+    print(f"{'to first reply':>14} {total:>8.1f}ms")
+    print(f"first request status: {runs[-1]['status']}")
+    print(f"heavy modules loaded: {', '.join(runs[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
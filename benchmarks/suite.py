@@ -0,0 +1,468 @@
+"""Run scripted load scenarios against the real app and compare two runs.
+
+Usage (from the repository root):
+
+    python benchmarks/suite.py run --out base.json
+    python benchmarks/suite.py run --users 1000 --sessions 100000 --concurrency 50 --out new.json
+    python benchmarks/suite.py compare base.json new.json --threshold 15
+
+``run`` loads a seeded dataset with datagen.py, starts uvicorn on it in a
+subprocess with CHAT_PROVIDER=fake, then drives these scenarios over HTTP
+and WebSockets:
+
+    login_storm           POST /api/auth/login for random users
+    dashboard_load        the dashboard's three parallel GETs, timed as one page load
+    history_paging        GET /api/sessions/, following next_cursor through a user's history
+    session_create_burst  POST /api/sessions/
+    chat_streaming        one WebSocket conversation per connection, timed to each complete reply
+
+For each scenario the JSON output has the request and error counts, the
+status counts, throughput, and p50/p95/p99 latency. It also has SQL queries
+per request for every route the scenario hit, read from /metrics.
+Which user each request acts as comes from --seed, so two runs with the same
+arguments send the same traffic. The rate-limit buckets are raised because
+all of the load comes from one address. Every other setting is the app's
+own.
+
+Without DATABASE_URL the data goes to a temporary SQLite file, which is fine
+for comparing two commits but serializes writes. For numbers that mean
+something, point DATABASE_URL at an empty PostgreSQL database that has
+already been through ``alembic upgrade head``.
+
+``compare`` lists every regression and exits 1 if it finds any. A
+regression is any of:
+- a latency percentile more than --threshold percent and --min-ms slower
+- throughput more than --threshold percent lower
+- an error rate more than a point (or --threshold percent of itself) higher
+- more queries per request on any route
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+SCENARIOS = ["login_storm", "dashboard_load", "history_paging", "session_create_burst", "chat_streaming"]
+LATENCY_KEYS = ["p50", "p95", "p99"]
+QUERY_SUMS = r'http_request_db_queries_(sum|count)\{method="([A-Z]+)",route="([^"]+)"\} (\S+)'
+
+
+def setup_environment():
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}")
+    os.environ.setdefault("EMAIL_OUTBOX_WORKER", "0")
+    os.environ.setdefault("TOKEN_SWEEPER", "0")
+    os.environ["CHAT_PROVIDER"] = "fake"
+    os.environ["RATE_LIMITS"] = json.dumps({
+        rule: "1000000/second"
+        for rule in ("login", "register", "forgot_password", "reset_password", "resend_verification", "chatbot")
+    })
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.extra = {}  # scenario-specific figures merged into the summary
+
+    def record(self, seconds: float, status, ok: bool):
+        self.latencies.append(seconds * 1000)
+        self.statuses[str(status)] += 1
+        self.errors += not ok
+
+    def summary(self, elapsed: float) -> dict:
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "statuses": dict(self.statuses),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round((count - self.errors) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(ordered, 0.50), 2),
+                "p95": round(percentile(ordered, 0.95), 2),
+                "p99": round(percentile(ordered, 0.99), 2),
+                "mean": round(sum(ordered) / count, 2),
+                "max": round(ordered[-1], 2),
+            } if count else {},
+            **self.extra,
+        }
+
+
+async def drive(operation, total: int, concurrency: int, recorder: Recorder) -> float:
+    """Run operation(state, i) for i in range(total) on concurrency workers; return the wall time"""
+    indexes = iter(range(total))
+
+    async def worker():
+        state = {}
+        for i in indexes:
+            started = time.perf_counter()
+            try:
+                status, ok = await operation(state, i)
+            except Exception as e:
+                status, ok = e.__class__.__name__, False
+            recorder.record(time.perf_counter() - started, status, ok)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+class Context:
+    def __init__(self, args, client, users: list, tokens: list):
+        self.args = args
+        self.client = client
+        self.users = users  # (user id, email) in generation order
+        self.tokens = tokens
+
+    def picks(self, scenario: str, count: int) -> list:
+        """Which user each request acts as; fixed by --seed so runs send the same traffic"""
+        rng = random.Random(f"{self.args.seed}-{scenario}")
+        return [rng.randrange(len(self.users)) for _ in range(count)]
+
+    def auth(self, user: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[user]}"}
+
+
+async def login_storm(ctx: Context, total: int, recorder: Recorder) -> float:
+    from datagen import PASSWORD
+
+    picks = ctx.picks("login_storm", total)
+
+    async def login(state, i):
+        response = await ctx.client.post(
+            "/api/auth/login", json={"email": ctx.users[picks[i]][1], "password": PASSWORD}
+        )
+        return response.status_code, response.status_code == 200
+
+    return await drive(login, total, ctx.args.concurrency, recorder)
+
+
+async def dashboard_load(ctx: Context, total: int, recorder: Recorder) -> float:
+    picks = ctx.picks("dashboard_load", total)
+    # The same three requests dashboard.js sends in parallel
+    routes = ["/api/stats/dashboard", "/api/sessions/?limit=5", "/api/stats/weekly"]
+
+    async def page_load(state, i):
+        headers = ctx.auth(picks[i])
+        responses = await asyncio.gather(*(ctx.client.get(route, headers=headers) for route in routes))
+        status = max(response.status_code for response in responses)
+        return status, status == 200
+
+    return await drive(page_load, total, ctx.args.concurrency, recorder)
+
+
+async def history_paging(ctx: Context, total: int, recorder: Recorder) -> float:
+    picks = ctx.picks("history_paging", total)
+
+    async def next_page(state, i):
+        if not state.get("cursor") or state["pages"] >= ctx.args.max_pages:
+            state.update(user=picks[i], cursor=None, pages=0)
+        params = {"limit": 20}
+        if state["cursor"]:
+            params["cursor"] = state["cursor"]
+        response = await ctx.client.get("/api/sessions/", params=params, headers=ctx.auth(state["user"]))
+        if response.status_code == 200:
+            state["cursor"] = response.json()["next_cursor"]
+        state["pages"] += 1
+        return response.status_code, response.status_code == 200
+
+    return await drive(next_page, total, ctx.args.concurrency, recorder)
+
+
+async def session_create_burst(ctx: Context, total: int, recorder: Recorder) -> float:
+    from datagen import SUBJECTS
+
+    picks = ctx.picks("session_create_burst", total)
+    today = datetime.combine(date.today(), datetime.min.time())
+
+    async def create(state, i):
+        start = today + timedelta(hours=8, minutes=i % 600)
+        response = await ctx.client.post("/api/sessions/", headers=ctx.auth(picks[i]), json={
+            "user_id": 0,
+            "subject": SUBJECTS[i % len(SUBJECTS)],
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=45)).isoformat(),
+            "quality": 1 + i % 5,
+            "percentage_completion": 80,
+        })
+        return response.status_code, response.status_code == 200
+
+    return await drive(create, total, ctx.args.concurrency, recorder)
+
+
+async def chat_streaming(ctx: Context, total: int, recorder: Recorder) -> float:
+    import websockets
+    from _chat import authenticate
+
+    url = str(ctx.client.base_url).replace("http", "ws", 1) + "/api/chatbot/ws"
+    connections = ctx.args.chat_connections
+    picks = ctx.picks("chat_streaming", connections)
+    first_chunks = []
+
+    async def converse(connection: int):
+        async with websockets.connect(url, max_size=None) as ws:
+            await authenticate(ws, ctx.tokens[picks[connection]])
+            for i in range(ctx.args.chat_messages):
+                # Every third question is about the user's own study time, which adds the study snapshot
+                message = "How much did I study this week?" if i % 3 == 2 else f"Any tips for revising, take {i}?"
+                sent = time.perf_counter()
+                await ws.send(json.dumps({"message": message, "personalized": True}))
+                first = True
+                while True:
+                    frame = json.loads(await ws.recv())
+                    if frame["type"] != "chunk":
+                        recorder.record(time.perf_counter() - sent, frame["type"], frame["type"] == "complete")
+                        break
+                    if first:
+                        first_chunks.append((time.perf_counter() - sent) * 1000)
+                        first = False
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(converse(c) for c in range(connections)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            recorder.record(elapsed, outcome.__class__.__name__, False)
+    if first_chunks:
+        first_chunks.sort()
+        recorder.extra["first_chunk_ms"] = {
+            key: round(percentile(first_chunks, int(key[1:]) / 100), 2) for key in LATENCY_KEYS
+        }
+    return elapsed
+
+
+SCENARIO_RUNNERS = {
+    "login_storm": login_storm,
+    "dashboard_load": dashboard_load,
+    "history_paging": history_paging,
+    "session_create_burst": session_create_burst,
+    "chat_streaming": chat_streaming,
+}
+
+
+async def query_counts(client) -> dict:
+    """(method, route) -> [total queries, requests] from /metrics, or {} when metrics are off"""
+    headers = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"} if os.getenv("METRICS_TOKEN") else {}
+    response = await client.get("/metrics", headers=headers)
+    if response.status_code != 200:
+        return {}
+    totals = {}
+    for kind, method, route, value in re.findall(QUERY_SUMS, response.text):
+        totals.setdefault(f"{method} {route}", [0.0, 0.0])[kind == "count"] = float(value)
+    return totals
+
+
+def queries_per_request(before: dict, after: dict) -> dict:
+    result = {}
+    for route, (queries, requests) in after.items():
+        previous_queries, previous_requests = before.get(route, [0.0, 0.0])
+        if requests > previous_requests and not route.endswith(" /metrics"):
+            result[route] = round((queries - previous_queries) / (requests - previous_requests), 2)
+    return result
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    import _bootstrap
+    import httpx
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        # The app logs with print; keep its stderr (tracebacks) but not a line per chat disconnect
+        cwd=_bootstrap.BACKEND_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 60s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_scenarios(args, users: list, tokens: list) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency * 3, max_keepalive_connections=args.concurrency * 3)
+    results = {}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+        ctx = Context(args, client, users, tokens)
+        for name in args.scenarios:
+            runner = SCENARIO_RUNNERS[name]
+            if name != "chat_streaming" and args.warmup:
+                await runner(ctx, args.warmup, Recorder())
+            before = await query_counts(client)
+            recorder = Recorder()
+            elapsed = await runner(ctx, args.requests, recorder)
+            results[name] = {
+                **recorder.summary(elapsed),
+                "queries_per_request": queries_per_request(before, await query_counts(client)),
+            }
+            summary = results[name]
+            latency = summary["latency_ms"]
+            print(f"{name:<22} {summary['requests']:>6} req {summary['throughput_rps']:>9.1f}/s "
+                  f"p50 {latency.get('p50', 0):>8.1f}ms p95 {latency.get('p95', 0):>8.1f}ms "
+                  f"p99 {latency.get('p99', 0):>8.1f}ms errors {summary['errors']}")
+    return results
+
+
+def run(args):
+    setup_environment()
+    import _bootstrap  # noqa: F401
+    import datagen
+    from api.routers.auth import create_access_token
+
+    started = time.perf_counter()
+    user_ids = datagen.load(args.users, args.sessions, args.seed, args.days)
+    print(f"loaded {args.users} users and {args.sessions} sessions in {time.perf_counter() - started:.1f}s")
+    users = [(user_id, datagen.email_for(args.seed, i)) for i, user_id in enumerate(user_ids)]
+    tokens = [create_access_token({"sub": str(user_id)}) for user_id, _ in users]
+
+    server = start_server(args.port, args.workers)
+    try:
+        scenarios = asyncio.run(run_scenarios(args, users, tokens))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            **{key: getattr(args, key) for key in (
+                "users", "sessions", "days", "seed", "requests", "concurrency", "warmup", "max_pages",
+                "chat_connections", "chat_messages", "workers"
+            )},
+        },
+        "scenarios": scenarios,
+    }
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"wrote {args.out}")
+
+
+def find_regressions(base: dict, new: dict, threshold: float, min_ms: float) -> list:
+    regressions = []
+    for name, old in base["scenarios"].items():
+        current = new["scenarios"].get(name)
+        if current is None:
+            continue
+        for key in LATENCY_KEYS:
+            before, after = old["latency_ms"].get(key), current["latency_ms"].get(key)
+            if before is not None and after is not None and after > before * (1 + threshold / 100) \
+                    and after - before >= min_ms:
+                regressions.append(f"{name}: {key} {before:.1f}ms -> {after:.1f}ms ({after / before - 1:+.0%})")
+        before, after = old["throughput_rps"], current["throughput_rps"]
+        if after < before * (1 - threshold / 100):
+            regressions.append(f"{name}: throughput {before:.1f}/s -> {after:.1f}/s ({after / before - 1:+.0%})")
+        # Load shedding (503s in the login storm) varies run to run, so small moves are not flagged
+        if current["error_rate"] > old["error_rate"] + max(0.01, old["error_rate"] * threshold / 100):
+            regressions.append(f"{name}: error rate {old['error_rate']:.2%} -> {current['error_rate']:.2%}")
+        for route, queries in current.get("queries_per_request", {}).items():
+            previous = old.get("queries_per_request", {}).get(route)
+            # Fractions come from cache hits; a whole extra query per request is the N+1 signal
+            if previous is not None and queries >= previous + 1:
+                regressions.append(f"{name}: {route} runs {previous:g} -> {queries:g} queries per request")
+    return regressions
+
+
+def compare(args):
+    base = json.loads(Path(args.base).read_text())
+    new = json.loads(Path(args.new).read_text())
+    print(f"base {base['meta']['git_commit']} ({base['meta']['created_at']}), "
+          f"new {new['meta']['git_commit']} ({new['meta']['created_at']})")
+    for key in ("users", "sessions", "seed", "requests", "concurrency", "database"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: runs differ in {key}: {base['meta'].get(key)} vs {new['meta'].get(key)}")
+
+    print(f"{'scenario':<22} {'metric':<10} {'base':>10} {'new':>10} {'change':>8}")
+    for name in SCENARIOS:
+        if name not in base["scenarios"] or name not in new["scenarios"]:
+            continue
+        old, current = base["scenarios"][name], new["scenarios"][name]
+        rows = [(key, old["latency_ms"].get(key), current["latency_ms"].get(key)) for key in LATENCY_KEYS]
+        rows.append(("req/s", old["throughput_rps"], current["throughput_rps"]))
+        for metric, before, after in rows:
+            if before is None or after is None:
+                continue
+            change = f"{after / before - 1:+.1%}" if before else "n/a"
+            print(f"{name:<22} {metric:<10} {before:>10.1f} {after:>10.1f} {change:>8}")
+
+    regressions = find_regressions(base, new, args.threshold, args.min_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nno regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="load data, run the scenarios and write a JSON report")
+    run_parser.add_argument("--out", default="benchmark-results.json")
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    run_parser.add_argument("--users", type=int, default=200)
+    run_parser.add_argument("--sessions", type=int, default=20_000)
+    run_parser.add_argument("--days", type=int, default=180)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--requests", type=int, default=500, help="measured requests per HTTP scenario")
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each HTTP scenario")
+    run_parser.add_argument("--max-pages", type=int, default=10, help="pages read per user when paging history")
+    run_parser.add_argument("--chat-connections", type=int, default=20)
+    run_parser.add_argument("--chat-messages", type=int, default=3, help="messages per chat connection")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers; /metrics then samples one")
+    run_parser.add_argument("--port", type=int, default=8770)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions of NEW against BASE")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=15, help="allowed change, in percent")
+    compare_parser.add_argument("--min-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
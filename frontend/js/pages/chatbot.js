@@ -136,7 +136,8 @@ const Chatbot = {
 
         this.socket.onopen = () => {
             console.log('WebSocket connected');
-            this.isConnected = true;
+            // The server waits for the token before accepting messages
+            this.socket.send(JSON.stringify({ type: 'auth', token: Utils.getFromStorage('token') }));
         };
 
         this.socket.onmessage = (event) => {
@@ -144,9 +145,16 @@ const Chatbot = {
             this.handleWebSocketMessage(data);
         };
 
-        this.socket.onclose = () => {
+        this.socket.onclose = (event) => {
             console.log('WebSocket disconnected');
             this.isConnected = false;
+            if (event.code === 1008) {
+                // Token rejected - logout user
+                localStorage.removeItem('token');
+                localStorage.removeItem('user');
+                window.location.href = 'login.html?expired=true';
+                return;
+            }
             // Try to reconnect after 3 seconds
             setTimeout(() => this.connectWebSocket(), 3000);
         };
@@ -227,7 +235,9 @@ const Chatbot = {
     },
 
     handleWebSocketMessage(data) {
-        if (data.type === 'chunk') {
+        if (data.type === 'ready') {
+            this.isConnected = true;
+        } else if (data.type === 'chunk') {
             this.hideTypingIndicator();
             if (!this.currentBotMessageDiv) {
                 this.currentBotMessageDiv = this.createMessageDiv('bot');
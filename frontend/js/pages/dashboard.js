@@ -149,14 +149,13 @@ const Dashboard = {
     async loadRecentSessions() {
         try {
             //  REAL API CALL - Get recent sessions
-            const sessions = await API.getSessions({
+            const page = await API.getSessions({
                 limit: 5,
-                order_by: 'start_time',
                 order_dir: 'desc'
             });
 
             // Update recent sessions UI
-            this.updateRecentSessionsUI(sessions);
+            this.updateRecentSessionsUI(page ? page.items : []);
 
         } catch (error) {
             console.error('Error loading recent sessions:', error);
@@ -246,15 +245,10 @@ const Dashboard = {
     // Get weekly study data from API
     async getWeeklyStudyData() {
         try {
-            // You might need to create a specific endpoint for weekly data
-            // For now, we'll calculate from sessions
-            const sessions = await API.getSessions({
-                limit: 100,
-                order_by: 'start_time',
-                order_dir: 'desc'
-            });
+            // Bucketed per day on the server: [{ day, date, hours, sessions }]
+            const weeklyData = await API.getWeeklyStats();
 
-            return this.calculateWeeklyData(sessions);
+            return weeklyData && weeklyData.length ? weeklyData : this.getDefaultWeeklyData();
 
         } catch (error) {
             console.error('Error getting weekly data:', error);
@@ -262,36 +256,6 @@ const Dashboard = {
         }
     },
 
-    // Calculate weekly data from sessions
-    calculateWeeklyData(sessions) {
-        // Get last 7 days
-        const days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
-        const weeklyData = days.map(day => ({ day, hours: 0 }));
-
-        if (!sessions || sessions.length === 0) {
-            return weeklyData;
-        }
-
-        // Calculate hours for each day
-        sessions.forEach(session => {
-            const sessionDate = new Date(session.start_time);
-            const dayIndex = (sessionDate.getDay() + 6) % 7; // Monday = 0
-
-            if (dayIndex >= 0 && dayIndex < 7) {
-                let duration = session.duration;
-                if (!duration && session.start_time && session.end_time) {
-                    const start = new Date(session.start_time);
-                    const end = new Date(session.end_time);
-                    duration = Math.round((end - start) / 60000); // minutes
-                }
-
-                weeklyData[dayIndex].hours += (duration || 0) / 60;
-            }
-        });
-
-        return weeklyData;
-    },
-
     // Get default weekly data (fallback)
     getDefaultWeeklyData() {
         const days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'];
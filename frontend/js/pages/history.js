@@ -3,6 +3,8 @@ const History = {
     currentPage: 1,
     itemsPerPage: 10,
     currentFilter: 'all',
+    // cursors[i] fetches page i + 1; the server hands back the next one with each page
+    cursors: [null],
 
     // Initialize history page
     init() {
@@ -65,30 +67,41 @@ const History = {
 
         this.currentFilter = filter;
         this.currentPage = 1;
+        this.cursors = [null];
         this.loadSessions();
     },
 
-    // Load sessions using your API.js
+    // Load one page of sessions using your API.js
     async loadSessions() {
         try {
             // Show loading state
             const tableBody = document.getElementById('historyTableBody');
             tableBody.innerHTML = '<tr><td colspan="6" style="text-align: center; padding: 40px;">Loading...</td></tr>';
 
-            // Get user_id from auth
             const user = Auth.getCurrentUser();
 
             if (!user || !user.id) {
                 throw new Error("User not authenticated");
             }
 
-            const userId = user.id;
+            // Filtering, sorting and paging all happen on the server
+            const range = this.getDateRange();
+            const params = { ...range, limit: this.itemsPerPage, order_dir: 'desc' };
+            const cursor = this.cursors[this.currentPage - 1];
+            if (cursor) {
+                params.cursor = cursor;
+            }
+
+            const [page, stats] = await Promise.all([
+                API.getSessions(params),
+                // Totals only change with the filter, not with the page
+                this.currentPage === 1 ? API.getHistoryStats(range) : Promise.resolve(null)
+            ]);
 
-            // USE YOUR API.JS - clean API call
-            let sessions = await API.getSessions({ user_id: userId });
+            this.cursors[this.currentPage] = page.next_cursor;
 
             // Normalize session data (calculate duration, map completion)
-            sessions = sessions.map(session => {
+            const sessions = page.items.map(session => {
                 let duration = session.duration || session.duration_minutes;
                 if (!duration && session.start_time && session.end_time) {
                     const start = new Date(session.start_time);
@@ -103,17 +116,16 @@ const History = {
                 };
             });
 
-            // Filter sessions (client-side filtering)
-            const filteredSessions = this.filterSessions(sessions);
-
             // Update stats
-            this.updateStats(filteredSessions);
+            if (stats) {
+                this.updateStats(stats);
+            }
 
             // Render sessions
-            this.renderSessions(filteredSessions);
+            this.renderSessions(sessions);
 
             // Render pagination
-            this.renderPagination(filteredSessions.length);
+            this.renderPagination(Boolean(page.next_cursor));
 
         } catch (error) {
             console.error('Error loading sessions:', error);
@@ -121,8 +133,8 @@ const History = {
         }
     },
 
-    // Filter sessions based on current filter
-    filterSessions(sessions) {
+    // Date range (YYYY-MM-DD, local time) for the current filter
+    getDateRange() {
         const now = new Date();
         const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
         const weekStart = new Date(today);
@@ -130,76 +142,44 @@ const History = {
         const monthStart = new Date(now.getFullYear(), now.getMonth(), 1);
         const yearStart = new Date(now.getFullYear(), 0, 1);
 
-        return sessions.filter(session => {
-            const sessionDate = new Date(session.start_time);
-
-            switch (this.currentFilter) {
-                case 'today':
-                    return sessionDate >= today;
-                case 'week':
-                    return sessionDate >= weekStart;
-                case 'month':
-                    return sessionDate >= monthStart;
-                case 'year':
-                    return sessionDate >= yearStart;
-                default:
-                    return true; // 'all'
-            }
-        });
-    },
-
-    // Update stats
-    updateStats(sessions) {
-        if (sessions.length === 0) {
-            const totalTimeElement = document.getElementById('historyTotalTime');
-            const totalSessionsElement = document.getElementById('historyTotalSessions');
-            const avgDurationElement = document.getElementById('historyAvgDuration');
-            const avgQualityElement = document.getElementById('historyAvgQuality');
-
-            if (totalTimeElement) {
-                totalTimeElement.textContent = '0h';
-                totalTimeElement.classList.remove('loading-placeholder');
-            }
-            if (totalSessionsElement) {
-                totalSessionsElement.textContent = '0';
-                totalSessionsElement.classList.remove('loading-placeholder');
-            }
-            if (avgDurationElement) {
-                avgDurationElement.textContent = '0m';
-                avgDurationElement.classList.remove('loading-placeholder');
-            }
-            if (avgQualityElement) {
-                avgQualityElement.textContent = '0.0';
-                avgQualityElement.classList.remove('loading-placeholder');
-            }
-            return;
+        const starts = {
+            today: today,
+            week: weekStart,
+            month: monthStart,
+            year: yearStart
+        };
+        const start = starts[this.currentFilter];
+        if (!start) {
+            return {}; // 'all'
         }
 
-        const totalMinutes = sessions.reduce((sum, session) => sum + (session.duration || 0), 0);
-        const avgDuration = Math.round(totalMinutes / sessions.length);
-        const avgQuality = sessions.length > 0
-            ? (sessions.reduce((sum, session) => sum + (session.quality || 0), 0) / sessions.length).toFixed(1)
-            : 0;
+        const pad = n => String(n).padStart(2, '0');
+        return {
+            start_date: `${start.getFullYear()}-${pad(start.getMonth() + 1)}-${pad(start.getDate())}`
+        };
+    },
 
+    // Update stats from the server-side totals
+    updateStats(stats) {
         const totalTimeElement = document.getElementById('historyTotalTime');
         const totalSessionsElement = document.getElementById('historyTotalSessions');
         const avgDurationElement = document.getElementById('historyAvgDuration');
         const avgQualityElement = document.getElementById('historyAvgQuality');
 
         if (totalTimeElement) {
-            totalTimeElement.textContent = Utils.formatDuration(totalMinutes);
+            totalTimeElement.textContent = stats.total_study_time ? Utils.formatDuration(stats.total_study_time) : '0h';
             totalTimeElement.classList.remove('loading-placeholder');
         }
         if (totalSessionsElement) {
-            totalSessionsElement.textContent = sessions.length;
+            totalSessionsElement.textContent = stats.total_sessions || 0;
             totalSessionsElement.classList.remove('loading-placeholder');
         }
         if (avgDurationElement) {
-            avgDurationElement.textContent = Utils.formatDuration(avgDuration);
+            avgDurationElement.textContent = stats.avg_session_length ? Utils.formatDuration(Math.round(stats.avg_session_length)) : '0m';
             avgDurationElement.classList.remove('loading-placeholder');
         }
         if (avgQualityElement) {
-            avgQualityElement.textContent = avgQuality;
+            avgQualityElement.textContent = (stats.avg_quality || 0).toFixed(1);
             avgQualityElement.classList.remove('loading-placeholder');
         }
     },
@@ -213,12 +193,7 @@ const History = {
             return;
         }
 
-        // Calculate pagination
-        const startIndex = (this.currentPage - 1) * this.itemsPerPage;
-        const endIndex = startIndex + this.itemsPerPage;
-        const paginatedSessions = sessions.slice(startIndex, endIndex);
-
-        tableBody.innerHTML = paginatedSessions.map(session => `
+        tableBody.innerHTML = sessions.map(session => `
             <tr>
                 <td>${Utils.formatDate(session.start_time || session.created_at)}</td>
                 <td>${session.subject || 'No Subject'}</td>
@@ -240,51 +215,37 @@ const History = {
     },
 
 
-    // Render pagination
-    renderPagination(totalItems) {
+    // Render pagination (keyset paging only knows whether a next page exists)
+    renderPagination(hasNextPage) {
         const pagination = document.getElementById('pagination');
-        const totalPages = Math.ceil(totalItems / this.itemsPerPage);
 
-        if (totalPages <= 1) {
+        if (this.currentPage === 1 && !hasNextPage) {
             pagination.style.display = 'none';
             return;
         }
 
         pagination.style.display = 'flex';
 
-        let html = '';
-
-        // Previous button
-        html += `
+        pagination.innerHTML = `
             <button class="page-btn" ${this.currentPage === 1 ? 'disabled' : ''} 
                 onclick="History.goToPage(${this.currentPage - 1})">
                 <i class="fas fa-chevron-left"></i>
             </button>
-        `;
-
-        // Page numbers
-        for (let i = 1; i <= totalPages; i++) {
-            html += `
-                <button class="page-btn ${this.currentPage === i ? 'active' : ''}" 
-                    onclick="History.goToPage(${i})">
-                    ${i}
-                </button>
-            `;
-        }
-
-        // Next button
-        html += `
-            <button class="page-btn" ${this.currentPage === totalPages ? 'disabled' : ''} 
+            <button class="page-btn active">
+                ${this.currentPage}
+            </button>
+            <button class="page-btn" ${hasNextPage ? '' : 'disabled'} 
                 onclick="History.goToPage(${this.currentPage + 1})">
                 <i class="fas fa-chevron-right"></i>
             </button>
         `;
-
-        pagination.innerHTML = html;
     },
 
-    // Go to page
+    // Go to page (only pages whose cursor is already known)
     goToPage(page) {
+        if (page < 1 || (page > 1 && !this.cursors[page - 1])) {
+            return;
+        }
         this.currentPage = page;
         this.loadSessions();
         window.scrollTo({ top: 0, behavior: 'smooth' });
@@ -307,6 +268,9 @@ const History = {
             await API.deleteSession(id);
 
             Utils.showNotification('Session deleted successfully', 'success');
+            // Later cursors may have shifted, so restart from the first page
+            this.currentPage = 1;
+            this.cursors = [null];
             this.loadSessions(); // Refresh the list
 
         } catch (error) {
@@ -133,11 +133,14 @@ const Profile = {
             // Get user profile
             const userProfile = await API.getProfile({ user_id: userId });
             
-            // Get user sessions for stats
-            const sessions = await API.getSessions({ user_id: userId });
+            // Totals come pre-aggregated from the server instead of every session
+            const [allTime, thisWeek] = await Promise.all([
+                API.getHistoryStats(),
+                API.getHistoryStats({ start_date: this.getWeekStart() })
+            ]);
             
             // Calculate stats from real data
-            const stats = this.calculateProfileStats(userProfile, sessions);
+            const stats = this.calculateProfileStats(userProfile, allTime, thisWeek);
             
             // Update UI
             this.updateStatsUI(stats);
@@ -158,33 +161,27 @@ const Profile = {
         }
     },
     
-    // Calculate profile stats from real data
-    calculateProfileStats(userProfile, sessions) {
-        // This week's sessions
+    // Start of week (Sunday) as YYYY-MM-DD
+    getWeekStart() {
         const now = new Date();
         const weekStart = new Date(now);
-        weekStart.setDate(now.getDate() - now.getDay()); // Start of week (Sunday)
-        
-        const thisWeekSessions = sessions.filter(session => 
-            new Date(session.start_time) >= weekStart
-        );
-        
-        const totalMinutesThisWeek = thisWeekSessions.reduce((sum, s) => sum + (s.duration_minutes || 0), 0);
-        const hoursThisWeek = totalMinutesThisWeek / 60;
+        weekStart.setDate(now.getDate() - now.getDay());
+        const pad = n => String(n).padStart(2, '0');
+        return `${weekStart.getFullYear()}-${pad(weekStart.getMonth() + 1)}-${pad(weekStart.getDate())}`;
+    },
+    
+    // Calculate profile stats from real data
+    calculateProfileStats(userProfile, allTime, thisWeek) {
+        const hoursThisWeek = (thisWeek.total_study_time || 0) / 60;
         const weeklyGoal = userProfile.studyGoal || 20;
         
-        let avgQuality = 0;
-        if (sessions.length > 0) {
-            avgQuality = sessions.reduce((sum, s) => sum + (s.quality || 0), 0) / sessions.length;
-        }
-        
         return {
             weeklyGoal: weeklyGoal,
             currentWeek: hoursThisWeek.toFixed(1),
             goalProgress: weeklyGoal > 0 ? Math.min(100, Math.round((hoursThisWeek / weeklyGoal) * 100)) : 0,
-            avgQuality: avgQuality.toFixed(1),
-            totalSessions: sessions.length,
-            totalHours: (sessions.reduce((sum, s) => sum + (s.duration_minutes || 0), 0) / 60).toFixed(1)
+            avgQuality: (allTime.avg_quality || 0).toFixed(1),
+            totalSessions: allTime.total_sessions || 0,
+            totalHours: ((allTime.total_study_time || 0) / 60).toFixed(1)
         };
     },
     
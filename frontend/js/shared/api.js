@@ -54,7 +54,7 @@ const API = {
     },
 
 
-    // Sessions
+    // Sessions - returns one page: { items, next_cursor }
     getSessions(params = {}) {
         const query = new URLSearchParams(params).toString();
         // Add trailing slash before query params
@@ -81,11 +81,25 @@ const API = {
         });
     },
 
+    // Several changes in one round trip: [{ op: 'create' | 'update' | 'delete', id, data }]
+    batchSessions(operations) {
+        return this.request('/api/sessions/batch', {
+            method: 'POST',
+            body: JSON.stringify({ operations })
+        });
+    },
+
     // Get weekly stats
     async getWeeklyStats() {
         return this.request('/api/stats/weekly/');
     },
 
+    // Get bucketed totals: { start, end, granularity: 'day' | 'week' | 'month' }
+    getTimeSeries(params = {}) {
+        const query = new URLSearchParams(params).toString();
+        return this.request(`/api/stats/timeseries?${query}`);
+    },
+
     // Auth
     login(credentials) {
         return this.request('/api/auth/login/', {
@@ -118,8 +132,9 @@ const API = {
         return this.request('/api/stats/dashboard/');
     },
 
-    getHistoryStats() {
-        return this.request('/api/stats/history/');
+    getHistoryStats(params = {}) {
+        const query = new URLSearchParams(params).toString();
+        return this.request(`/api/stats/history/?${query}`);
     },
 
     forgotPassword(data) {
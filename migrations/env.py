@@ -1,10 +1,15 @@
+import sys
 from logging.config import fileConfig
+from pathlib import Path
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 
-from backend.config import settings
-from backend.database import Base
-import backend.models
+# The backend imports its modules flat (import models), as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from config import settings
+from database import Base
+import models
 
 config = context.config
 
@@ -25,6 +30,7 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -42,6 +48,8 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            # SQLite cannot alter columns in place; autogenerate batch ops that rebuild the table
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -1,7 +1,7 @@
 """init
 
 Revision ID: 13fe51d24f7e
-Revises: 
+Revises: f2c7a91d4b30
 Create Date: 2026-02-04 21:26:46.622465
 
 """
@@ -10,7 +10,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '13fe51d24f7e'
-down_revision = None
+down_revision = 'f2c7a91d4b30'
 branch_labels = None
 depends_on = None
 
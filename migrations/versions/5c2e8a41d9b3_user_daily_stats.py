@@ -0,0 +1,60 @@
+"""user daily stats rollup
+
+Revision ID: 5c2e8a41d9b3
+Revises: 13fe51d24f7e
+Create Date: 2026-10-18 10:12:31.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8a41d9b3'
+down_revision = '13fe51d24f7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_daily_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total_minutes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('session_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('quality_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completion_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+    )
+
+    # Same rounding as crud.calculate_duration_minutes: whole minutes, floored, never negative
+    if op.get_context().dialect.name == 'sqlite':
+        minutes = "MAX(0, CAST(ROUND((julianday(end_time) - julianday(start_time)) * 86400) AS INTEGER) / 60)"
+        day = "date(start_time)"
+    else:
+        minutes = "GREATEST(0, FLOOR(EXTRACT(EPOCH FROM (end_time - start_time)) / 60))"
+        day = "CAST(start_time AS DATE)"
+
+    # Sessions created before this revision never had duration_minutes filled in
+    op.execute(f"""
+        UPDATE study_sessions
+        SET duration_minutes = {minutes}
+        WHERE duration_minutes IS NULL AND start_time IS NOT NULL AND end_time IS NOT NULL
+    """)
+
+    op.execute(f"""
+        INSERT INTO user_daily_stats (user_id, day, total_minutes, session_count, quality_sum, completion_sum)
+        SELECT user_id,
+               {day},
+               COALESCE(SUM(duration_minutes), 0),
+               COUNT(id),
+               COALESCE(SUM(quality), 0),
+               COALESCE(SUM(percentage_completion), 0)
+        FROM study_sessions
+        WHERE user_id IS NOT NULL AND start_time IS NOT NULL
+        GROUP BY user_id, {day}
+    """)
+
+
+def downgrade():
+    op.drop_table('user_daily_stats')
@@ -0,0 +1,31 @@
+"""study date column and user/start_time index
+
+Revision ID: a7d3f9c2e614
+Revises: 5c2e8a41d9b3
+Create Date: 2026-10-18 11:03:57.904216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f9c2e614'
+down_revision = '5c2e8a41d9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('study_sessions', sa.Column('study_date', sa.Date(), nullable=True))
+    # SQLite's CAST(... AS DATE) keeps only the year; date() gives the ISO day SQLAlchemy reads back
+    day = "date(start_time)" if op.get_context().dialect.name == 'sqlite' else "CAST(start_time AS DATE)"
+    op.execute(f"UPDATE study_sessions SET study_date = {day} WHERE start_time IS NOT NULL")
+
+    op.create_index('ix_study_sessions_user_id_start_time', 'study_sessions', ['user_id', 'start_time'])
+    op.create_index('ix_study_sessions_user_id_study_date', 'study_sessions', ['user_id', 'study_date'])
+
+
+def downgrade():
+    op.drop_index('ix_study_sessions_user_id_study_date', table_name='study_sessions')
+    op.drop_index('ix_study_sessions_user_id_start_time', table_name='study_sessions')
+    op.drop_column('study_sessions', 'study_date')
@@ -0,0 +1,30 @@
+"""weekly digests
+
+Revision ID: b93f0d5e7a18
+Revises: e41b6c07d2a9
+Create Date: 2026-10-18 16:40:51.772093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b93f0d5e7a18'
+down_revision = 'e41b6c07d2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'weekly_digests',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'week_start')
+    )
+
+
+def downgrade():
+    op.drop_table('weekly_digests')
@@ -0,0 +1,66 @@
+"""hash stored tokens, partial index on unused ones
+
+Revision ID: c5a8e2f14b63
+Revises: b93f0d5e7a18
+Create Date: 2026-10-18 18:05:12.640517
+
+"""
+import hashlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8e2f14b63'
+down_revision = 'b93f0d5e7a18'
+branch_labels = None
+depends_on = None
+
+TABLES = ['email_verifications', 'password_resets']
+
+
+def upgrade():
+    offline = op.get_context().as_sql
+    for table in TABLES:
+        # Used and expired tokens are dead weight; live ones keep working once hashed
+        if offline:
+            # Printed SQL is run later, on PostgreSQL, so the cutoff must be evaluated there
+            op.execute(f"DELETE FROM {table} WHERE is_used OR expires_at <= NOW() AT TIME ZONE 'UTC'")
+        else:
+            op.execute(
+                sa.text(f"DELETE FROM {table} WHERE is_used OR expires_at <= :now").bindparams(now=datetime.utcnow())
+            )
+        op.add_column(table, sa.Column('token_hash', sa.String(length=64), nullable=True))
+        if offline:
+            # No rows to read when only printing SQL
+            op.execute(f"UPDATE {table} SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex')")
+        else:
+            # Hashed the way TokenManager.hash_token does, so it works on any database
+            bind = op.get_bind()
+            rows = bind.execute(sa.text(f"SELECT id, token FROM {table}")).all()
+            if rows:
+                bind.execute(
+                    sa.text(f"UPDATE {table} SET token_hash = :token_hash WHERE id = :id"),
+                    [{"id": id, "token_hash": hashlib.sha256(token.encode()).hexdigest()} for id, token in rows]
+                )
+        op.drop_index(f'ix_{table}_token', table_name=table)
+        # SQLite cannot alter a column in place; batch mode rebuilds the table there
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column('token_hash', existing_type=sa.String(length=64), nullable=False)
+            batch.drop_column('token')
+        op.create_index(
+            f'ix_{table}_unused_token_hash', table, ['token_hash'], unique=True,
+            postgresql_where=sa.text('NOT is_used'), sqlite_where=sa.text('NOT is_used')
+        )
+
+
+def downgrade():
+    # Raw tokens cannot be recovered from their hashes; outstanding links stop working
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_unused_token_hash', table_name=table)
+        op.execute(f"DELETE FROM {table}")
+        with op.batch_alter_table(table, recreate='always') as batch:
+            batch.drop_column('token_hash')
+            batch.add_column(sa.Column('token', sa.String(), nullable=False))
+        op.create_index(f'ix_{table}_token', table, ['token'], unique=True)
@@ -0,0 +1,74 @@
+"""base tables
+
+Revision ID: f2c7a91d4b30
+Revises: 
+Create Date: 2026-10-18 16:12:40.318552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2c7a91d4b30'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app used to create these with create_all at startup; skip any that already exist
+    if op.get_context().as_sql:
+        existing = set()
+    else:
+        existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(), nullable=True),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('password', sa.String(), nullable=True),
+            sa.Column('gender', sa.String(), nullable=True),
+            sa.Column('birthdate', sa.Date(), nullable=True),
+            sa.Column('user_class', sa.String(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    for table in ('email_verifications', 'password_resets'):
+        if table in existing:
+            continue
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=True),
+            sa.Column('token', sa.String(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('is_used', sa.Boolean(), nullable=True),
+        )
+        op.create_index(f'ix_{table}_id', table, ['id'])
+        op.create_index(f'ix_{table}_token', table, ['token'], unique=True)
+
+    if 'study_sessions' not in existing:
+        op.create_table(
+            'study_sessions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=True),
+            sa.Column('subject', sa.String(), nullable=True),
+            sa.Column('end_time', sa.DateTime(), nullable=True),
+            sa.Column('duration_minutes', sa.Integer(), nullable=True),
+            sa.Column('quality', sa.Integer(), nullable=True),
+            sa.Column('percentage_completion', sa.Integer(), nullable=True),
+            sa.Column('notes', sa.String(), nullable=True),
+        )
+        op.create_index('ix_study_sessions_id', 'study_sessions', ['id'])
+
+
+def downgrade():
+    op.drop_table('study_sessions')
+    op.drop_table('password_resets')
+    op.drop_table('email_verifications')
+    op.drop_table('users')